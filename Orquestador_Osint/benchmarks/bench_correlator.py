@@ -0,0 +1,103 @@
+"""
+Mide el coste de correlar un resultado grande: extracción repetida por cada
+consumidor (grafo, Maltego, informe) frente a un EntitySet compartido y memorizado.
+
+Uso:
+    python benchmarks/bench_correlator.py [--domains 300] [--ips 20] [--images 5000] [--render]
+
+--render incluye el PNG del grafo (domina el tiempo; ver también el tamaño del grafo).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.correlator import (EntitySet, EntitySetCache, build_relationship_graph, export_to_maltego,
+                              generate_correlation_report, generate_graphviz_visualization)
+
+
+def synthetic_result(domains, ips_per_domain, images, seed=7):
+    """Resultado con dns/whois/subdominios por dominio, un username y un lote de fotos con GPS"""
+    rng = random.Random(seed)
+    results = []
+    for d in range(domains):
+        domain = f"domain{d}.example"
+        ips = [f"10.{d % 256}.{i // 256}.{i % 256}" for i in range(ips_per_domain)]
+        results.append({"module": "dns", "input": domain,
+                        "records": {"A": ips, "NS": [f"ns{d % 7}.dns.example.", f"ns{d % 5}.dns.example."]}})
+        results.append({"module": "whois", "result": {"domain_name": domain, "org": f"Org {d % 40}",
+                                                      "registrar_abuse_email": f"abuse@registrar{d % 9}.example",
+                                                      "name_servers": [f"ns{d % 7}.dns.example"]}})
+        results.append({"module": "subdomains", "input": domain,
+                        "subdomains": [{"name": f"s{s}.{domain}", "ips": [ips[s % len(ips)]]} for s in range(10)]})
+    results.append({"module": "username_check", "input": "alice",
+                    "sites": [{"url": f"https://site{i}.example/alice", "exists": i % 3 == 0} for i in range(80)]})
+    centers = [(40.4168, -3.7038), (41.3874, 2.1686), (48.8566, 2.3522), (51.5072, -0.1276)]
+    imgs = []
+    for i in range(images):
+        lat, lon = centers[i % len(centers)]
+        imgs.append({"file": f"img{i}.jpg", "status": "success",
+                     "metadata": {"gps": {"Latitude_Decimal": lat + rng.gauss(0, 0.001),
+                                          "Longitude_Decimal": lon + rng.gauss(0, 0.001)}}})
+    results.append({"module": "exif_metadata", "results": imgs})
+    return {"results": results}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--domains", type=int, default=300)
+    p.add_argument("--ips", type=int, default=20, help="Registros A por dominio")
+    p.add_argument("--images", type=int, default=5000)
+    p.add_argument("--render", action="store_true", help="Dibujar también el PNG del grafo")
+    args = p.parse_args()
+
+    data = synthetic_result(args.domains, args.ips, args.images)
+    tmp = tempfile.mkdtemp()
+    out = os.path.join(tmp, "bench")
+
+    def graph(source):
+        if args.render:
+            generate_graphviz_visualization(source, out)
+        else:
+            build_relationship_graph(source)
+
+    def per_consumer():
+        # Como antes: cada consumidor recorre el resultado completo
+        graph(data)
+        export_to_maltego(data, out)
+        generate_correlation_report(data)
+
+    def shared(es):
+        graph(es)
+        export_to_maltego(es, out)
+        generate_correlation_report(es)
+
+    es = EntitySet.from_result(data)
+    print(f"{len(data['results'])} resultados de módulo, {es.graph.number_of_nodes()} nodos, "
+          f"{es.graph.number_of_edges()} aristas, {len(es.clusters)} clusters GPS")
+
+    extract = timed(lambda: EntitySet.from_result(data))
+    legacy = timed(per_consumer)
+    once = timed(lambda: shared(EntitySet.from_result(data)))
+    cache = EntitySetCache()
+    cache.get("bench", lambda: data)
+    memo = timed(lambda: shared(cache.get("bench", lambda: data)))
+
+    print(f"extracción (una vez):              {extract * 1000:9.1f} ms")
+    print(f"3 consumidores, extracción c/u:    {legacy * 1000:9.1f} ms")
+    print(f"3 consumidores, EntitySet único:   {once * 1000:9.1f} ms")
+    print(f"3 consumidores, EntitySet en LRU:  {memo * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compara la lectura de EXIF por cabeceras (mmap) con la ruta Pillow.
+
+Uso:
+    python benchmarks/bench_exif.py [directorio con imágenes] [--count N] [--size 6000x4000]
+
+Sin directorio genera un corpus temporal de JPEG y TIFF grandes con EXIF y GPS.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from modules.exif_module import _read_image_metadata
+
+
+def build_corpus(directory, count, width, height):
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (width, height), (i * 37 % 256, 90, 160))
+        exif = Image.Exif()
+        exif[0x010F] = "Canon"
+        exif[0x0110] = f"EOS {i}"
+        exif[0x0132] = "2024:05:01 10:00:00"
+        exif[0x011A] = IFDRational(300)
+        exif[0x8825] = {1: "N", 2: (IFDRational(40), IFDRational(25), IFDRational(i % 60)),
+                        3: "W", 4: (IFDRational(3), IFDRational(42), IFDRational(7))}
+        for ext in ("jpg", "tiff"):
+            path = os.path.join(directory, f"img_{i}.{ext}")
+            img.save(path, exif=exif.tobytes(), **({"quality": 92} if ext == "jpg" else {}))
+            paths.append(path)
+    return paths
+
+
+def run(paths, fast, repeat):
+    """Mejor tiempo de repeat pasadas (la primera calienta caché de disco e imports)"""
+    _read_image_metadata(paths[0], fast=fast)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [_read_image_metadata(p, fast=fast) for p in paths]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def _comparable(result):
+    return json.dumps(result, sort_keys=True, default=str)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("directory", nargs="?")
+    p.add_argument("--count", type=int, default=10, help="Imágenes de cada formato en el corpus generado")
+    p.add_argument("--size", default="6000x4000", help="Tamaño de las imágenes generadas")
+    p.add_argument("--repeat", type=int, default=3, help="Pasadas por ruta (se toma la mejor)")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.directory:
+            paths = sorted(f for f in glob.glob(os.path.join(args.directory, "*")) if os.path.isfile(f))
+        else:
+            width, height = (int(v) for v in args.size.split("x"))
+            paths = build_corpus(tmp, args.count, width, height)
+        total_mb = sum(os.path.getsize(f) for f in paths) / 1e6
+        print(f"{len(paths)} ficheros, {total_mb:.1f} MB")
+
+        pillow_s, pillow = run(paths, False, args.repeat)
+        fast_s, fast = run(paths, True, args.repeat)
+        print(f"Pillow:     {pillow_s * 1000:9.1f} ms  ({pillow_s / len(paths) * 1000:.2f} ms/fichero)")
+        print(f"cabeceras:  {fast_s * 1000:9.1f} ms  ({fast_s / len(paths) * 1000:.2f} ms/fichero)")
+        print(f"aceleración: x{pillow_s / fast_s:.1f}")
+
+        # La ruta Pillow no lee EXIF de TIFF (_getexif no existe allí); solo se comparan los que funcionan
+        both = [(p, a, b) for p, a, b in zip(paths, pillow, fast) if a[0] is not None]
+        mismatches = [p for p, a, b in both if _comparable(a) != _comparable(b)]
+        print(f"resultados idénticos: {len(both) - len(mismatches)}/{len(both)}")
+        for path in mismatches:
+            print(f"  distinto: {path}")
+
+
+if __name__ == "__main__":
+    main()
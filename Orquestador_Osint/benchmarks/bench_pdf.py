@@ -0,0 +1,87 @@
+"""
+Tiempo y memoria máxima (RSS) del informe PDF consolidado según el nº de objetivos:
+un único story con todas las secciones frente a la generación por tandas.
+
+Cada medida se ejecuta en un proceso nuevo para que el pico de RSS sea el suyo.
+
+Uso:
+    python benchmarks/bench_pdf.py [--targets 10 100 500] [--chunk 20]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def synthetic_scan(i):
+    """Escaneo de dominio con whois, dns, http_meta y shodan, más algunas fotos"""
+    domain = f"target{i}.example"
+    return {
+        "target": {"domain": domain},
+        "started": "2026-01-01T00:00:00",
+        "results": [
+            {"module": "whois", "result": {"domain_name": domain, "registrar": f"Registrar {i % 13}",
+                                           "org": f"Org {i % 40}", "country": "ES",
+                                           "creation_date": "2010-05-01", "name_servers": ["ns1.dns.example",
+                                                                                            "ns2.dns.example"]}},
+            {"module": "dns", "records": {"A": [f"10.{i % 256}.0.{k}" for k in range(8)],
+                                          "MX": [f"mx.{domain}"], "NS": ["ns1.dns.example"],
+                                          "TXT": ["v=spf1 -all"]}},
+            {"module": "http_meta", "title": f"Home of {domain}", "final_url": f"https://{domain}/"},
+            {"module": "shodan_host", "result": {"ip": f"10.{i % 256}.0.1", "organization": f"Org {i % 40}",
+                                                 "ports": [22, 80, 443], "hostnames": [domain],
+                                                 "services": [{"port": 443, "product": "nginx"}]}},
+            {"module": "exif_metadata", "results": [
+                {"status": "success", "metadata": {
+                    "file_info": {"filename": f"img{i}_{k}.jpg", "format": "JPEG", "mode": "RGB",
+                                  "size_pixels": "4000x3000", "file_size_bytes": 2_500_000},
+                    "exif": {"Make": "Canon", "Model": "EOS", "DateTimeOriginal": "2024:01:01 10:00:00"},
+                    "gps": {"Latitude_Decimal": 40.4 + k / 100, "Longitude_Decimal": -3.7}}}
+                for k in range(3)]},
+        ],
+    }
+
+
+def run_one(targets, chunk):
+    from utils.pdf_generator import generate_multi_target_pdf
+    results = [synthetic_scan(i) for i in range(targets)]
+    out = os.path.join(tempfile.mkdtemp(), "report.pdf")
+    start = time.perf_counter()
+    generate_multi_target_pdf(results, out, chunk_size=chunk)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss en KB en Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{elapsed:.3f} {rss:.1f} {os.path.getsize(out)}")
+
+
+def measure(targets, chunk):
+    out = subprocess.run([sys.executable, __file__, "--worker", str(targets), str(chunk)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), float(out[1]), int(out[2])
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--targets", type=int, nargs="+", default=[10, 100, 500])
+    p.add_argument("--chunk", type=int, default=20, help="Objetivos por tanda")
+    p.add_argument("--worker", type=int, nargs=2, help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.worker:
+        run_one(*args.worker)
+        return
+
+    print(f"{'objetivos':>9} | {'un story: s':>11} {'RSS MB':>8} | {'tandas: s':>9} {'RSS MB':>8} | {'PDF KB':>8}")
+    for n in args.targets:
+        whole_s, whole_rss, _ = measure(n, n)
+        chunk_s, chunk_rss, size = measure(n, args.chunk)
+        print(f"{n:>9} | {whole_s:>11.2f} {whole_rss:>8.1f} | {chunk_s:>9.2f} {chunk_rss:>8.1f} | {size / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
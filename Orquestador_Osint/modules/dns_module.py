@@ -1,18 +1,38 @@
-import dns.resolver
+from utils.dns_engine import QTYPES, get_dns_engine
 from utils.helpers import pretty_now
 
-def module_dns(domain, summary: bool = False):
+def module_dns(domain, summary: bool = False, engine=None):
     out = {"module": "dns", "input": domain, "ts": pretty_now(), "records": {}}
-    qtypes = ["A", "AAAA", "MX", "NS", "TXT"]
-    resolver = dns.resolver.Resolver()
-    # AÑADIR ESTAS LÍNEAS para usar DNS públicos (evita problemas con routers/ISP)
-    resolver.nameservers = ["8.8.8.8", "1.1.1.1"]  
-    resolver.timeout = 5
-    resolver.lifetime = 10
-    for q in qtypes:
-        try:
-            answers = resolver.resolve(domain, q)
-            out["records"][q] = [r.to_text() for r in answers]
-        except Exception as e:
-            out["records"][q] = {"error": str(e)}
-    return out
\ No newline at end of file
+    # Todos los tipos de registro en paralelo sobre el resolver compartido (con caché por TTL)
+    records, min_ttl = (engine or get_dns_engine()).resolve_all(domain, QTYPES)
+    out["records"] = records
+    if min_ttl is not None:
+        out["min_ttl"] = min_ttl
+    return out
+
+async def module_dns_async(domain, summary: bool = False, engine=None):
+    """Versión asyncio de module_dns"""
+    out = {"module": "dns", "input": domain, "ts": pretty_now(), "records": {}}
+    records, min_ttl = await (engine or get_dns_engine()).resolve_all_async(domain, QTYPES)
+    out["records"] = records
+    if min_ttl is not None:
+        out["min_ttl"] = min_ttl
+    return out
+
+def module_dns_bulk(domains, qtypes=("A",), concurrency=500, engine=None):
+    """
+    Resuelve una lista de dominios (decenas de miles) con el resolver asíncrono.
+
+    Returns:
+        lista de resultados con la misma forma que module_dns, uno por dominio
+    """
+    results = []
+    
+    def collect(domain, records, min_ttl):
+        res = {"module": "dns", "input": domain, "ts": pretty_now(), "records": records}
+        if min_ttl is not None:
+            res["min_ttl"] = min_ttl
+        results.append(res)
+    
+    (engine or get_dns_engine()).resolve_many(domains, list(qtypes), concurrency, on_result=collect)
+    return results
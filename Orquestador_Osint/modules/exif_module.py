@@ -1,13 +1,24 @@
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.exif_reader import read_header_metadata
 from utils.helpers import pretty_now
 
 try:
     from PIL import Image
     from PIL.ExifTags import TAGS, GPSTAGS
+    from PIL.TiffImagePlugin import IFDRational
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
 
+# A partir de cuántas imágenes compensa repartir el trabajo entre procesos
+PARALLEL_MIN_FILES = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
 def _convert_gps_to_degrees(value):
     """Convierte coordenadas GPS a grados decimales"""
     try:
@@ -39,8 +50,63 @@ def _extract_gps_info(gps_info):
     
     return gps_data
 
-def _read_image_metadata(path):
+def _exif_to_metadata(metadata, exif):
+    """Rellena metadata["exif"] y metadata["gps"] a partir del dict tag -> valor"""
+    if exif:
+        for tag_id, value in exif.items():
+            tag = TAGS.get(tag_id, tag_id)
+            
+            # Procesar GPS por separado
+            if tag == "GPSInfo":
+                metadata["gps"] = _extract_gps_info(value)
+            else:
+                # Convertir a tipos serializables
+                if isinstance(value, bytes):
+                    try:
+                        metadata["exif"][tag] = value.decode('utf-8', errors='ignore')
+                    except:
+                        metadata["exif"][tag] = str(value)
+                elif isinstance(value, (tuple, list)):
+                    metadata["exif"][tag] = str(value)
+                else:
+                    metadata["exif"][tag] = value
+    return metadata
+
+def _new_metadata(path, fmt, width, height, mode):
+    return {
+        "file_info": {
+            "filename": os.path.basename(path),
+            "format": fmt,
+            "size_pixels": f"{width}x{height}",
+            "mode": mode,
+            "file_size_bytes": os.path.getsize(path)
+        },
+        "exif": {},
+        "gps": None
+    }
+
+def _read_header_metadata(path):
+    """Ruta rápida: solo cabeceras JPEG/TIFF vía mmap; None si hay que usar Pillow"""
+    try:
+        header = read_header_metadata(path, rational=IFDRational)
+    except (OSError, ValueError):
+        return None
+    if header is None:
+        return None
+    metadata = _new_metadata(path, header["format"], header["width"], header["height"], header["mode"])
+    return _exif_to_metadata(metadata, header["exif"])
+
+def _read_pillow_metadata(path):
     """Lee metadatos de una imagen usando Pillow"""
+    img = Image.open(path)
+    try:
+        metadata = _new_metadata(path, img.format, img.size[0], img.size[1], img.mode)
+        return _exif_to_metadata(metadata, img._getexif())
+    finally:
+        img.close()
+
+def _read_image_metadata(path, fast=True):
+    """Lee metadatos de una imagen: cabeceras JPEG/TIFF si es posible, si no Pillow"""
     if not PIL_AVAILABLE:
         return None, "Pillow no está instalado. Instala con: pip install Pillow"
     
@@ -48,55 +114,58 @@ def _read_image_metadata(path):
         return None, "Archivo no encontrado"
     
     try:
-        img = Image.open(path)
-        metadata = {
-            "file_info": {
-                "filename": os.path.basename(path),
-                "format": img.format,
-                "size_pixels": f"{img.size[0]}x{img.size[1]}",
-                "mode": img.mode,
-                "file_size_bytes": os.path.getsize(path)
-            },
-            "exif": {},
-            "gps": None
-        }
-        
-        # Extraer EXIF
-        exif = img._getexif()
-        if exif:
-            for tag_id, value in exif.items():
-                tag = TAGS.get(tag_id, tag_id)
-                
-                # Procesar GPS por separado
-                if tag == "GPSInfo":
-                    metadata["gps"] = _extract_gps_info(value)
-                else:
-                    # Convertir a tipos serializables
-                    if isinstance(value, bytes):
-                        try:
-                            metadata["exif"][tag] = value.decode('utf-8', errors='ignore')
-                        except:
-                            metadata["exif"][tag] = str(value)
-                    elif isinstance(value, (tuple, list)):
-                        metadata["exif"][tag] = str(value)
-                    else:
-                        metadata["exif"][tag] = value
-        
-        img.close()
-        return metadata, None
+        metadata = _read_header_metadata(path) if fast else None
+        return metadata or _read_pillow_metadata(path), None
         
     except Exception as e:
         return None, f"Error al procesar imagen: {str(e)}"
 
-def module_exif(paths):
+def _timed_read(path):
+    """_read_image_metadata más el tiempo empleado en ms (se ejecuta en los procesos del pool)"""
+    start = time.perf_counter()
+    metadata, error = _read_image_metadata(path)
+    return metadata, error, round((time.perf_counter() - start) * 1000, 2)
+
+def _get_pool():
+    """Pool de procesos compartido, con un proceso por núcleo"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _pool
+
+def _file_result(path, metadata, error, elapsed_ms):
+    if metadata:
+        return {"file": path, "status": "success", "metadata": metadata, "elapsed_ms": elapsed_ms}
+    return {"file": path, "status": "error", "error": error, "elapsed_ms": elapsed_ms}
+
+def _iter_parallel(paths):
+    # (índice, resultado) según termina cada imagen
+    futures = {_get_pool().submit(_timed_read, path): i for i, path in enumerate(paths)}
+    for fut in as_completed(futures):
+        i = futures[fut]
+        try:
+            yield i, _file_result(paths[i], *fut.result())
+        except Exception as e:
+            yield i, _file_result(paths[i], None, f"Error al procesar imagen: {str(e)}", None)
+
+def _iter_serial(paths):
+    for i, path in enumerate(paths):
+        yield i, _file_result(path, *_timed_read(path))
+
+def module_exif(paths, parallel=None, on_result=None):
     """
-    Analiza metadatos de imágenes usando solo Pillow (sin dependencias externas)
+    Analiza metadatos de imágenes: cabeceras JPEG/TIFF leídas con mmap y Pillow para el resto
     
     Args:
         paths: str o lista de rutas de archivos de imagen
+        parallel: repartir las imágenes entre un proceso por núcleo; None = solo
+                  si hay al menos PARALLEL_MIN_FILES
+        on_result: callable(resultado de un fichero) llamado según termina cada imagen
     
     Returns:
-        dict con resultados estructurados
+        dict con resultados estructurados, en el orden de paths
     """
     if isinstance(paths, str):
         paths = [paths]
@@ -109,20 +178,13 @@ def module_exif(paths):
         "results": []
     }
     
-    for path in paths:
-        metadata, error = _read_image_metadata(path)
-        
-        if metadata:
-            out["results"].append({
-                "file": path,
-                "status": "success",
-                "metadata": metadata
-            })
-        else:
-            out["results"].append({
-                "file": path,
-                "status": "error",
-                "error": error
-            })
+    if parallel is None:
+        parallel = len(paths) >= PARALLEL_MIN_FILES and (os.cpu_count() or 1) > 1
+    results = [None] * len(paths)
+    for i, item in (_iter_parallel(paths) if parallel else _iter_serial(paths)):
+        results[i] = item
+        if on_result:
+            on_result(item)
+    out["results"] = results
     
-    return out
\ No newline at end of file
+    return out
@@ -1,29 +1,296 @@
-from bs4 import BeautifulSoup
-from utils.helpers import pretty_now, safe_request_get
+import asyncio
+import codecs
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from requests.structures import CaseInsensitiveDict
+from utils.helpers import pretty_now, stream_request_get
 
-def module_http_meta(domain, summary: bool = False):
-    out = {"module": "http_meta", "input": domain, "ts": pretty_now()}
-    hosts = [domain] if domain.startswith("http") else [
+# Bytes máximos que se leen de cada página; el parseo se corta antes en </head>
+HEAD_MAX_BYTES = 256 * 1024
+# Timeout de cada candidato y plazo total para encontrar uno que responda
+PROBE_TIMEOUT = 15
+PROBE_DEADLINE = 20
+# Hilos para las sondas de todo el proceso: 4 candidatos por dominio para los workers
+# del pipeline (MAX_WORKERS) o de la web (OSINT_SCAN_WORKERS) sin hacer cola
+PROBE_WORKERS = 64
+# Cuánto se recuerda qué esquema/host respondió para cada dominio
+WINNER_TTL = 24 * 3600
+WINNER_MAX = 4096
+
+_winners = OrderedDict()
+_winners_lock = threading.Lock()
+
+_probe_pool = None
+_probe_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {"pages": 0, "bytes_read": 0}
+
+def http_meta_stats():
+    """Páginas analizadas y bytes leídos en total por module_http_meta"""
+    with _stats_lock:
+        return dict(_stats)
+
+def _count(bytes_read):
+    with _stats_lock:
+        _stats["pages"] += 1
+        _stats["bytes_read"] += bytes_read
+
+class _HeadParser(HTMLParser):
+    """Parser incremental que extrae <title> y <meta> y se detiene al salir de <head>"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._in_title = False
+        self._title = []
+        self.title_seen = False
+        self.metas = {}
+        self.done = False
+        self.cancel = None
+
+    def feed_bytes(self, chunk):
+        """Callback on_chunk de stream_request_get: True cuando ya no hace falta leer más"""
+        if self.cancel is not None and self.cancel.is_set():
+            return True
+        if not self.done:
+            self.feed(self._decoder.decode(chunk))
+        return self.done
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "title":
+            self._in_title = True
+            self.title_seen = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = attrs.get("name") or attrs.get("property") or attrs.get("itemprop")
+            if key:
+                self.metas[key.lower()] = attrs.get("content") or ""
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title.append(data)
+
+    @property
+    def title(self):
+        title = "".join(self._title).strip()
+        return title or None
+
+def _charset(headers):
+    ctype = CaseInsensitiveDict(headers or {}).get("Content-Type", "")
+    for part in ctype.split(";")[1:]:
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset":
+            return value.strip("\"' ").lower()
+    return None
+
+def _candidate_urls(domain):
+    return [domain] if domain.startswith("http") else [
         f"https://{domain}", f"https://www.{domain}",
         f"http://{domain}",  f"http://www.{domain}"
     ]
-    for url in hosts:
-        r = safe_request_get(url, timeout=15)
-        if "error" in r:
-            continue
-        if r.get("status_code") and r["status_code"] < 400:
-            text = r.get("text", "")
-            soup = BeautifulSoup(text, "html.parser")
-            title = soup.title.string.strip() if soup.title and soup.title.string else None
-            metas = {(m.get("name") or m.get("property") or m.get("itemprop")).lower(): m.get("content", "")
-                     for m in soup.find_all("meta") if (m.get("name") or m.get("property") or m.get("itemprop"))}
-            desc = metas.get("description")
-            out["final_url"] = r.get("url")
-            out["status_code"] = r.get("status_code")
-            out["headers"] = r.get("headers")
-            out["title"] = title
-            out["meta_tags"] = metas
-            out["robots"] = metas.get("robots")
-            return out
-    out["error"] = "no reachable HTTP(S) endpoint"
-    return out
\ No newline at end of file
+
+def _cached_winner(domain):
+    with _winners_lock:
+        item = _winners.get(domain)
+        if item is None:
+            return None
+        if item[0] <= time.time():
+            del _winners[domain]
+            return None
+        _winners.move_to_end(domain)
+        return item[1]
+
+def _remember_winner(domain, url):
+    with _winners_lock:
+        if url is None:
+            _winners.pop(domain, None)
+            return
+        _winners[domain] = (time.time() + WINNER_TTL, url)
+        _winners.move_to_end(domain)
+        while len(_winners) > WINNER_MAX:
+            _winners.popitem(last=False)
+
+def _probe_outcome(r, parser):
+    # (respuesta, parser) si el candidato vale; False si ha fallado
+    if "error" in r or not r.get("status_code") or r["status_code"] >= 400:
+        return False
+    return r, parser
+
+def _best(outcomes):
+    """
+    Primer candidato válido en orden de prioridad, None si alguno de más prioridad
+    sigue pendiente y False si han fallado todos.
+    """
+    for outcome in outcomes:
+        if outcome is None:
+            return None
+        if outcome is not False:
+            return outcome
+    return False
+
+def _any_success(outcomes):
+    return next((o for o in outcomes if o), None)
+
+def _fill_from_response(out, r, parser):
+    """Rellena out con título y meta tags ya extraídos por el parser"""
+    charset = _charset(r.get("headers"))
+    if charset and charset not in ("utf-8", "utf8"):
+        # El parser decodificó como UTF-8; se repite sobre el texto ya decodificado con el charset real
+        parser = _HeadParser()
+        parser.feed(r.get("text", ""))
+    out["final_url"] = r.get("url")
+    out["status_code"] = r.get("status_code")
+    out["headers"] = r.get("headers")
+    out["title"] = parser.title
+    out["meta_tags"] = parser.metas
+    out["robots"] = parser.metas.get("robots")
+    out["bytes_read"] = r.get("bytes_read", 0)
+    _count(out["bytes_read"])
+    return out
+
+def _finish(out, domain, winner):
+    if not winner:
+        _remember_winner(domain, None)
+        out["error"] = "no reachable HTTP(S) endpoint"
+        return out
+    (r, parser), url = winner
+    _remember_winner(domain, url)
+    out["probed_url"] = url
+    return _fill_from_response(out, r, parser)
+
+def _probe_timeout(limit):
+    # Ningún candidato espera más allá del plazo total
+    return max(0.1, min(PROBE_TIMEOUT, limit - time.monotonic()))
+
+def _probe(url, cancel, timeout=PROBE_TIMEOUT):
+    parser = _HeadParser()
+    parser.cancel = cancel
+    r = stream_request_get(url, timeout=timeout, max_bytes=HEAD_MAX_BYTES, on_chunk=parser.feed_bytes)
+    return _probe_outcome(r, parser)
+
+def _get_probe_pool():
+    global _probe_pool
+    if _probe_pool is None:
+        with _probe_pool_lock:
+            if _probe_pool is None:
+                _probe_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="http-probe")
+    return _probe_pool
+
+def _queued_probe(url, cancel, limit):
+    # El timeout se calcula al empezar: si la sonda esperó en cola, no pasa del plazo;
+    # si ya no hace falta (plazo agotado u otro candidato ganó) no se conecta
+    if cancel.is_set() or limit <= time.monotonic():
+        return False
+    return _probe(url, cancel, _probe_timeout(limit))
+
+def _start_probe(url, cancel, limit):
+    return _get_probe_pool().submit(_queued_probe, url, cancel, limit)
+
+def _probe_parallel(urls, limit):
+    """
+    Lanza todos los candidatos a la vez y devuelve ((respuesta, parser), url) del de
+    más prioridad que responda antes de limit (time.monotonic()), o None. Los que
+    sigan en vuelo dejan de leer el cuerpo.
+    """
+    if not urls or limit <= time.monotonic():
+        return None
+    cancel = threading.Event()
+    futures = [_start_probe(url, cancel, limit) for url in urls]
+    outcomes = [None] * len(urls)
+    pending = set(futures)
+    best = None
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0, limit - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                outcomes[futures.index(fut)] = fut.result()
+            best = _best(outcomes)
+            if best is not None:
+                break
+        if not best:
+            # Plazo agotado: vale cualquier candidato que haya respondido
+            best = _any_success(outcomes)
+        return (best, urls[outcomes.index(best)]) if best else None
+    finally:
+        cancel.set()
+
+def module_http_meta(domain, summary: bool = False, deadline=None):
+    """
+    Título, meta tags y cabeceras de la web del dominio. Prueba en paralelo https/http
+    con y sin www y se queda con el primero que responda en ese orden de prioridad.
+
+    Args:
+        deadline: segundos como máximo para encontrar un candidato (PROBE_DEADLINE por defecto),
+                  incluido el intento con el candidato que respondió la última vez
+    """
+    out = {"module": "http_meta", "input": domain, "ts": pretty_now()}
+    limit = time.monotonic() + (deadline or PROBE_DEADLINE)
+    urls = _candidate_urls(domain)
+    cached = _cached_winner(domain)
+    if cached:
+        # Re-escaneo: se va directo al esquema/host que respondió la última vez
+        winner = _probe_parallel([cached], limit)
+        if winner:
+            return _finish(out, domain, winner)
+        urls = [u for u in urls if u != cached]
+    return _finish(out, domain, _probe_parallel(urls, limit))
+
+async def _probe_async(client, url, timeout=PROBE_TIMEOUT):
+    parser = _HeadParser()
+    r = await client.get_stream(url, timeout=timeout, max_bytes=HEAD_MAX_BYTES, on_chunk=parser.feed_bytes)
+    return _probe_outcome(r, parser)
+
+async def _probe_parallel_async(client, urls, limit):
+    if not urls or limit <= time.monotonic():
+        return None
+    timeout = _probe_timeout(limit)
+    tasks = [asyncio.ensure_future(_probe_async(client, url, timeout)) for url in urls]
+    outcomes = [None] * len(urls)
+    pending = set(tasks)
+    best = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0, limit - time.monotonic()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                outcomes[tasks.index(task)] = task.result()
+            best = _best(outcomes)
+            if best is not None:
+                break
+        if not best:
+            best = _any_success(outcomes)
+        return (best, urls[outcomes.index(best)]) if best else None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def module_http_meta_async(domain, summary: bool = False, client=None, deadline=None):
+    """Versión asyncio de module_http_meta; client es un utils.async_http.AsyncHttpClient"""
+    out = {"module": "http_meta", "input": domain, "ts": pretty_now()}
+    limit = time.monotonic() + (deadline or PROBE_DEADLINE)
+    urls = _candidate_urls(domain)
+    cached = _cached_winner(domain)
+    if cached:
+        winner = await _probe_parallel_async(client, [cached], limit)
+        if winner:
+            return _finish(out, domain, winner)
+        urls = [u for u in urls if u != cached]
+    return _finish(out, domain, await _probe_parallel_async(client, urls, limit))
@@ -1,8 +1,17 @@
-import requests
-from utils.helpers import pretty_now
+import json
+from utils.helpers import get_session, pretty_now
 
 # Añade aquí tu API key (solo para uso local/laboratorio — no subir a repos públicos)
 DEFAULT_NUMVERIFY_KEY = "554731d4da37219ea6aa98d49717b621"
+NUMVERIFY_URL = "http://apilayer.net/api/validate"
+
+def _numverify_params(phone, key):
+    return {
+        "access_key": key,
+        "number": phone,
+        "country_code": "",
+        "format": 1
+    }
 
 def module_phone_lookup(phone, api_key=None):
     out = {"module": "phone_lookup", "input": phone, "ts": pretty_now()}
@@ -11,19 +20,31 @@ def module_phone_lookup(phone, api_key=None):
     if not key:
         out["error"] = "No numverify API key provided"
         return out
-    url = "http://apilayer.net/api/validate"
-    params = {
-        "access_key": key,
-        "number": phone,
-        "country_code": "",
-        "format": 1
-    }
     try:
-        r = requests.get(url, params=params, timeout=8)
+        r = get_session().get(NUMVERIFY_URL, params=_numverify_params(phone, key), timeout=8)
         if r.status_code == 200:
             out["result"] = r.json()
         else:
             out["error"] = f"HTTP {r.status_code} - {r.text[:200]}"
     except Exception as e:
         out["error"] = str(e)
-    return out
\ No newline at end of file
+    return out
+
+async def module_phone_lookup_async(phone, api_key=None, client=None):
+    """Versión asyncio de module_phone_lookup"""
+    out = {"module": "phone_lookup", "input": phone, "ts": pretty_now()}
+    key = api_key or DEFAULT_NUMVERIFY_KEY
+    if not key:
+        out["error"] = "No numverify API key provided"
+        return out
+    r = await client.get(NUMVERIFY_URL, params=_numverify_params(phone, key), timeout=8)
+    if "error" in r:
+        out["error"] = r["error"]
+    elif r["status_code"] == 200:
+        try:
+            out["result"] = json.loads(r["text"])
+        except ValueError as e:
+            out["error"] = str(e)
+    else:
+        out["error"] = f"HTTP {r['status_code']} - {r['text'][:200]}"
+    return out
@@ -1,8 +1,55 @@
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor
 from utils.helpers import pretty_now
+from utils.shodan_client import get_client, normalize_ip
 
 # API Key de Shodan (reemplazar con la tuya desde https://account.shodan.io)
 DEFAULT_SHODAN_KEY = "kDHBboGP9eXWktZd9pUAkFbJNlcVdnJF"
+# Hilos de module_shodan_hosts: solapan la latencia; el ritmo lo marca el límite del cliente
+BULK_WORKERS = 4
+
+def _fill_host_result(out, status_code, body):
+    """Rellena out a partir de la respuesta de /shodan/host (body es el JSON ya decodificado si 200)"""
+    if status_code is None:
+        out["error"] = body
+    elif status_code == 200:
+        data = body
+        
+        # Extraer información relevante
+        out["result"] = {
+            "ip": data.get("ip_str"),
+            "organization": data.get("org"),
+            "isp": data.get("isp"),
+            "asn": data.get("asn"),
+            "country": data.get("country_name"),
+            "city": data.get("city"),
+            "hostnames": data.get("hostnames", []),
+            "domains": data.get("domains", []),
+            "ports": data.get("ports", []),
+            "vulns": list(data.get("vulns", {}).keys()) if data.get("vulns") else [],
+            "last_update": data.get("last_update"),
+            "total_services": len(data.get("data", []))
+        }
+        
+        # Servicios detectados (limitado a primeros 5)
+        services = []
+        for service in data.get("data", [])[:5]:
+            services.append({
+                "port": service.get("port"),
+                "transport": service.get("transport"),
+                "product": service.get("product"),
+                "version": service.get("version"),
+                "banner": service.get("data", "")[:200]
+            })
+        out["result"]["services"] = services
+        
+    elif status_code == 401:
+        out["error"] = "Invalid Shodan API key"
+    elif status_code == 404:
+        out["error"] = "No information available for this IP"
+    else:
+        out["error"] = f"HTTP {status_code}: {body[:200]}"
+    return out
 
 def module_shodan_host(ip, api_key=None):
     """
@@ -18,56 +65,70 @@ def module_shodan_host(ip, api_key=None):
         out["error"] = "No Shodan API key provided. Get one at https://account.shodan.io/register"
         return out
     
-    url = f"https://api.shodan.io/shodan/host/{ip}"
-    params = {"key": key}
+    address = normalize_ip(ip)
+    if address is None:
+        out["error"] = "Invalid IP address"
+        return out
     
+    # Límite de ritmo, reintentos, caché por IP y deduplicación en el cliente compartido por clave
     try:
-        r = requests.get(url, params=params, timeout=10)
-        
-        if r.status_code == 200:
-            data = r.json()
-            
-            # Extraer información relevante
-            out["result"] = {
-                "ip": data.get("ip_str"),
-                "organization": data.get("org"),
-                "isp": data.get("isp"),
-                "asn": data.get("asn"),
-                "country": data.get("country_name"),
-                "city": data.get("city"),
-                "hostnames": data.get("hostnames", []),
-                "domains": data.get("domains", []),
-                "ports": data.get("ports", []),
-                "vulns": list(data.get("vulns", {}).keys()) if data.get("vulns") else [],
-                "last_update": data.get("last_update"),
-                "total_services": len(data.get("data", []))
-            }
-            
-            # Servicios detectados (limitado a primeros 5)
-            services = []
-            for service in data.get("data", [])[:5]:
-                services.append({
-                    "port": service.get("port"),
-                    "transport": service.get("transport"),
-                    "product": service.get("product"),
-                    "version": service.get("version"),
-                    "banner": service.get("data", "")[:200]
-                })
-            out["result"]["services"] = services
-            
-        elif r.status_code == 401:
-            out["error"] = "Invalid Shodan API key"
-        elif r.status_code == 404:
-            out["error"] = "No information available for this IP"
-        else:
-            out["error"] = f"HTTP {r.status_code}: {r.text[:200]}"
-            
+        _fill_host_result(out, *get_client(key).host(address))
     except Exception as e:
         out["error"] = str(e)
     
     return out
 
 
+def module_shodan_hosts(ips, api_key=None, max_workers=BULK_WORKERS):
+    """
+    Consulta muchas IPs (p.ej. todos los registros A de un lote de dominios) al
+    ritmo máximo que permite la clave. Las IPs repetidas se consultan una vez y
+    las ya consultadas salen de la caché del cliente sin gastar peticiones.
+
+    Returns:
+        dict con un resultado como el de module_shodan_host por IP distinta, en el
+        orden de ips, y las estadísticas del cliente durante la consulta
+    """
+    out = {"module": "shodan_hosts", "input": list(ips), "ts": pretty_now(), "results": []}
+    key = api_key or DEFAULT_SHODAN_KEY
+    if not key:
+        out["error"] = "No Shodan API key provided. Get one at https://account.shodan.io/register"
+        return out
+    
+    unique = list(dict.fromkeys(normalize_ip(ip) or str(ip).strip() for ip in out["input"]))
+    client = get_client(key)
+    before = client.stats()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as ex:
+        out["results"] = list(ex.map(lambda ip: module_shodan_host(ip, api_key=key), unique))
+    after = client.stats()
+    out["stats"] = {"ips": len(out["input"]), "unique": len(unique),
+                    "elapsed_s": round(time.monotonic() - start, 3),
+                    **{k: after[k] - before[k] for k in ("requests", "retries", "rate_limited", "cache_hits",
+                                                         "deduplicated")}}
+    return out
+
+
+async def module_shodan_host_async(ip, api_key=None, client=None):
+    """Versión asyncio de module_shodan_host"""
+    out = {"module": "shodan_host", "input": ip, "ts": pretty_now()}
+    
+    key = api_key or DEFAULT_SHODAN_KEY
+    if not key:
+        out["error"] = "No Shodan API key provided. Get one at https://account.shodan.io/register"
+        return out
+    
+    address = normalize_ip(ip)
+    if address is None:
+        out["error"] = "Invalid IP address"
+        return out
+    try:
+        _fill_host_result(out, *await get_client(key).host_async(address, client))
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
 def module_shodan_search(query, api_key=None, max_results=10):
     """
     Búsqueda en Shodan usando queries (ej: "apache country:ES")
@@ -81,14 +142,11 @@ def module_shodan_search(query, api_key=None, max_results=10):
         out["error"] = "No Shodan API key provided"
         return out
     
-    url = "https://api.shodan.io/shodan/host/search"
-    params = {"key": key, "query": query}
-    
     try:
-        r = requests.get(url, params=params, timeout=15)
+        # El cliente comprueba antes los créditos de consulta si la búsqueda los gasta
+        status_code, data = get_client(key).search(query)
         
-        if r.status_code == 200:
-            data = r.json()
+        if status_code == 200:
             results = []
             
             for match in data.get("matches", [])[:max_results]:
@@ -107,8 +165,10 @@ def module_shodan_search(query, api_key=None, max_results=10):
                 "returned": len(results),
                 "matches": results
             }
+        elif status_code is None:
+            out["error"] = data
         else:
-            out["error"] = f"HTTP {r.status_code}: {r.text[:200]}"
+            out["error"] = f"HTTP {status_code}: {data[:200]}"
             
     except Exception as e:
         out["error"] = str(e)
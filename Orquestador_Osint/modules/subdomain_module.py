@@ -0,0 +1,77 @@
+import asyncio
+import os
+import uuid
+from utils.dns_engine import get_dns_engine
+from utils.helpers import pretty_now
+from utils.ratelimit import TokenBucket
+
+DEFAULT_WORDLIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "subdomains.txt")
+CONCURRENCY = 500
+# Etiquetas aleatorias que se consultan para detectar DNS comodín (*.dominio)
+WILDCARD_PROBES = 3
+
+def _iter_words(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            word = line.strip().lower().rstrip(".")
+            if word and not word.startswith("#"):
+                yield word
+
+async def _wildcard_ips(engine, domain):
+    """IPs a las que resuelven nombres inexistentes; vacío si no hay comodín"""
+    probes = [f"{uuid.uuid4().hex[:12]}.{domain}" for _ in range(WILDCARD_PROBES)]
+    answers = await asyncio.gather(*(engine.query_async(p, "A") for p in probes))
+    ips = set()
+    for records, _ in answers:
+        if isinstance(records, list):
+            ips.update(records)
+    return ips
+
+async def module_subdomains_async(domain, wordlist=None, rate=None, concurrency=CONCURRENCY, on_hit=None, engine=None):
+    """
+    Descubre subdominios probando cada palabra del wordlist como <palabra>.<dominio>.
+
+    Args:
+        domain: dominio base
+        wordlist: fichero con una palabra por línea (por defecto data/subdomains.txt)
+        rate: consultas por segundo como máximo (None = sin límite)
+        concurrency: consultas simultáneas
+        on_hit: callable(hit) llamado en cuanto se encuentra cada subdominio
+        engine: utils.dns_engine.DnsEngine (por defecto el compartido)
+
+    Returns:
+        dict con los subdominios encontrados y las IPs de cada uno
+    """
+    domain = domain.strip().lower().rstrip(".")
+    wordlist = os.path.abspath(wordlist or DEFAULT_WORDLIST)
+    engine = engine or get_dns_engine()
+    out = {"module": "subdomains", "input": domain, "ts": pretty_now(), "wordlist": wordlist,
+           "tested": 0, "wildcard": False, "subdomains": []}
+    if not os.path.exists(wordlist):
+        out["error"] = f"Wordlist no encontrado: {wordlist}"
+        return out
+
+    wildcard = await _wildcard_ips(engine, domain)
+    if wildcard:
+        out["wildcard"] = True
+        out["wildcard_ips"] = sorted(wildcard)
+
+    def collect(name, records, min_ttl):
+        ips = records.get("A")
+        # Con DNS comodín solo cuentan los nombres que resuelven a algo distinto del comodín
+        if not isinstance(ips, list) or not ips or set(ips) <= wildcard:
+            return
+        hit = {"name": name, "ips": ips}
+        out["subdomains"].append(hit)
+        if on_hit:
+            on_hit(dict(hit, domain=domain))
+
+    names = (f"{w}.{domain}" for w in _iter_words(wordlist))
+    limiter = TokenBucket(rate) if rate else None
+    out["tested"] = await engine.resolve_many_async(names, ("A",), concurrency, on_result=collect, limiter=limiter)
+    out["subdomains"].sort(key=lambda h: h["name"])
+    return out
+
+def module_subdomains(domain, wordlist=None, rate=None, concurrency=CONCURRENCY, on_hit=None, engine=None):
+    """Versión bloqueante de module_subdomains_async (ejecuta su propio loop)"""
+    return asyncio.run(module_subdomains_async(domain, wordlist, rate, concurrency, on_hit, engine))
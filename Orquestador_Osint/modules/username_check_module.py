@@ -1,31 +1,281 @@
-from utils.helpers import pretty_now
+from utils.helpers import STREAM_CHUNK, get_session, pretty_now, stream_request_get
+from utils.ratelimit import KeyedRateLimiter
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from urllib.parse import quote, urlparse
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import time
-
-SOCIAL_SITES = [
-    "https://twitter.com/{username}",
-    "https://www.facebook.com/{username}",
-    "https://www.instagram.com/{username}/",
-    "https://github.com/{username}",
-    "https://www.reddit.com/user/{username}",
-    "https://www.tiktok.com/@{username}",
-    "https://www.linkedin.com/in/{username}",
-]
-
-def module_username_check(username, sites=SOCIAL_SITES, concurrency=6, verify_tls=True, compact=False):
+from requests.structures import CaseInsensitiveDict
+
+SITES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "username_sites.json")
+# Peticiones por segundo (y ráfaga) contra un mismo host, compartido por todas las comprobaciones
+HOST_RATE = 2.0
+HOST_BURST = 4
+SITE_TIMEOUT = 8
+# Hilos para comprobar sitios, compartidos por todas las llamadas del proceso: en un lote
+# los usuarios que se comprueban a la vez no multiplican los hilos
+SITE_WORKERS = 32
+
+_host_limiter = KeyedRateLimiter(HOST_RATE, HOST_BURST)
+_site_pool = None
+_site_pool_lock = threading.Lock()
+
+def _get_site_pool():
+    global _site_pool
+    if _site_pool is None:
+        with _site_pool_lock:
+            if _site_pool is None:
+                _site_pool = ThreadPoolExecutor(max_workers=SITE_WORKERS, thread_name_prefix="username-site")
+    return _site_pool
+
+def set_host_rate(rate, burst=None):
+    """Cambia el límite de peticiones por segundo y host para las siguientes comprobaciones"""
+    global _host_limiter
+    _host_limiter = KeyedRateLimiter(rate, burst if burst is not None else max(1, rate * 2))
+
+# Estados que indican sin ambigüedad que el perfil no existe
+MISSING_STATUS = (404, 410)
+# Si el servidor rechaza HEAD se repite como GET sin leer el cuerpo
+HEAD_REJECTED = (405, 501)
+# Bytes máximos leídos por comprobación con la estrategia "marker"
+MARKER_MAX_BYTES = 64 * 1024
+# Cuerpo que se llega a leer en un GET sin cuerpo útil para devolver la conexión al pool
+DRAIN_MAX_BYTES = 32 * 1024
+
+def _normalize_site(site):
+    """
+    Admite tanto dicts del fichero de sitios como los antiguos patrones de URL en texto.
+
+    Estrategias ("strategy"):
+        status   existe si el estado es expect_status; no existe si es 404/410
+        redirect sin seguir redirecciones: una redirección cuyo Location contiene
+                 missing_redirect indica que no existe; cualquier otra (o expect_status) que sí
+        marker   GET en streaming que se corta al encontrar present_marker (existe)
+                 o absent_marker (no existe), o al leer max_bytes
+
+    "method" solo puede ser HEAD (por defecto) o GET; cualquier otro se comprueba con GET.
+    """
+    if isinstance(site, str):
+        site = {"url": site}
+    site = dict(site)
+    site.setdefault("name", urlparse(site["url"]).hostname)
+    if "marker" in site:
+        site.setdefault("present_marker", site.pop("marker"))
+    site.setdefault("strategy", "marker" if site.get("present_marker") or site.get("absent_marker") else "status")
+    method = "GET" if site["strategy"] == "marker" else str(site.get("method") or "HEAD").upper()
+    site["method"] = method if method in ("HEAD", "GET") else "GET"
+    site.setdefault("expect_status", 200)
+    site.setdefault("max_bytes", MARKER_MAX_BYTES)
+    return site
+
+@lru_cache(maxsize=8)
+def _load_sites(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return tuple(_normalize_site(s) for s in json.load(f))
+
+def load_sites(path=None):
+    """
+    Carga las definiciones de sitios (URL con {username}, método, estrategia de detección).
+
+    Returns:
+        tupla de dicts normalizados
+    """
+    return _load_sites(os.path.abspath(path or SITES_FILE))
+
+def _resolve_sites(sites):
+    return load_sites() if sites is None else tuple(_normalize_site(s) for s in sites)
+
+def _site_url(site, username):
+    return site["url"].format(username=quote(username, safe=""))
+
+class _MarkerScanner:
+    """Busca los marcadores del sitio trozo a trozo; conserva un solape para marcadores partidos"""
+
+    def __init__(self, site):
+        self.present = site.get("present_marker", "").encode("utf-8")
+        self.absent = site.get("absent_marker", "").encode("utf-8")
+        self.keep = max(len(self.present), len(self.absent))
+        self.tail = b""
+        self.found = None
+
+    def __call__(self, chunk):
+        window = self.tail + chunk
+        if self.present and self.present in window:
+            self.found = True
+        elif self.absent and self.absent in window:
+            self.found = False
+        self.tail = window[-self.keep:] if self.keep else b""
+        return self.found is not None
+
+    def verdict(self, complete=True):
+        """complete: se leyó el cuerpo entero (si no, la falta de un marcador no prueba nada)"""
+        if self.found is not None:
+            return self.found
+        if not complete:
+            return None
+        # Fin del cuerpo sin ver ningún marcador
+        if self.absent and not self.present:
+            return True
+        if self.present and not self.absent:
+            return False
+        return None
+
+def _status_verdict(site, status_code):
+    if status_code == site["expect_status"]:
+        return True
+    if status_code in MISSING_STATUS:
+        return False
+    return None
+
+def _redirect_verdict(site, status_code, location):
+    if 300 <= status_code < 400:
+        missing = site.get("missing_redirect")
+        return not (missing and missing in (location or ""))
+    return _status_verdict(site, status_code)
+
+def _site_result(site, url, exists, r=None, bytes_read=0):
+    out = {"site": site["name"], "url": url, "exists": exists, "strategy": site["strategy"], "bytes": bytes_read}
+    if r is not None and "error" not in r:
+        out["status_code"] = r["status_code"]
+    return out
+
+def check_site(site, username, verify_tls=True):
+    """Comprueba un único sitio respetando el límite por host"""
+    url = _site_url(site, username)
+    _host_limiter.acquire(urlparse(url).hostname)
+    if site["strategy"] == "marker":
+        scanner = _MarkerScanner(site)
+        r = stream_request_get(url, timeout=SITE_TIMEOUT, max_bytes=site["max_bytes"], on_chunk=scanner,
+                               headers={"Range": f"bytes=0-{site['max_bytes'] - 1}"},
+                               allow_redirects=False, verify=verify_tls)
+        return _marker_result(site, url, r, scanner)
+    try:
+        if site["method"] == "GET":
+            r = _head_as_get(url, verify_tls)
+        else:
+            r = get_session().head(url, timeout=SITE_TIMEOUT, verify=verify_tls, allow_redirects=False)
+            if r.status_code in HEAD_REJECTED:
+                r = _head_as_get(url, verify_tls)
+    except Exception:
+        return _site_result(site, url, None)
+    r = {"status_code": r.status_code, "headers": r.headers}
+    return _verdict_result(site, url, r)
+
+def _head_as_get(url, verify_tls):
+    # GET en streaming: solo interesan estado y cabeceras. Un cuerpo pequeño (redirecciones,
+    # 404) se lee entero para que la conexión vuelva al pool; si es grande se corta y se descarta
+    r = get_session().get(url, timeout=SITE_TIMEOUT, verify=verify_tls, allow_redirects=False, stream=True)
+    read = 0
+    try:
+        for chunk in r.iter_content(STREAM_CHUNK):
+            read += len(chunk)
+            if read > DRAIN_MAX_BYTES:
+                break
+    except requests.RequestException:
+        pass
+    finally:
+        r.close()
+    return r
+
+def _verdict_result(site, url, r):
+    if site["strategy"] == "redirect":
+        exists = _redirect_verdict(site, r["status_code"], r["headers"].get("Location"))
+    else:
+        exists = _status_verdict(site, r["status_code"])
+    return _site_result(site, url, exists, r)
+
+def _whole_body(r):
+    # Cortado por max_bytes, o un 206 (Range) que no cubre el documento entero
+    if r.get("truncated"):
+        return False
+    if r["status_code"] == 206:
+        total = CaseInsensitiveDict(r.get("headers") or {}).get("Content-Range", "").rpartition("/")[2]
+        return total.isdigit() and int(total) <= r.get("bytes_read", 0)
+    return True
+
+def _marker_result(site, url, r, scanner):
+    if "error" in r:
+        return _site_result(site, url, None)
+    if r["status_code"] in MISSING_STATUS:
+        exists = False
+    elif r["status_code"] in (200, 206):
+        exists = scanner.verdict(_whole_body(r))
+    else:
+        exists = None
+    return _site_result(site, url, exists, r, r.get("bytes_read", 0))
+
+def _run_checks(pairs, concurrency, verify_tls):
+    """
+    Ejecuta check_site para cada (usuario, sitio) en el pool compartido, con como mucho
+    concurrency comprobaciones de esta llamada en vuelo. Genera (usuario, resultado)
+    según terminan.
+    """
+    pool = _get_site_pool()
+    pairs = iter(pairs)
+    pending = {}
+
+    def submit():
+        for username, site in pairs:
+            pending[pool.submit(check_site, site, username, verify_tls)] = username
+            return
+
+    for _ in range(max(1, concurrency)):
+        submit()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            yield pending.pop(f), f.result()
+            submit()
+
+def module_username_check(username, sites=None, concurrency=8, verify_tls=True, compact=False):
+    """Comprueba username en cada sitio; concurrency limita las comprobaciones a la vez de esta llamada"""
+    results = {"module": "username_check", "input": username, "ts": pretty_now(), "sites": []}
+    for _, res in _run_checks(((username, s) for s in _resolve_sites(sites)), concurrency, verify_tls):
+        results["sites"].append(res)
+    results["bytes_read"] = sum(s["bytes"] for s in results["sites"])
+    return results
+
+def module_username_check_many(usernames, sites=None, concurrency=32, verify_tls=True, compact=False):
+    """
+    Comprueba muchos usuarios de una vez: todas las parejas (usuario, sitio) comparten
+    hilos, sesión HTTP y límites por host.
+
+    Returns:
+        lista de resultados con la forma de module_username_check, en el orden de usernames
+    """
+    sites = _resolve_sites(sites)
+    by_user = {}
+    for username in usernames:
+        by_user[username] = {"module": "username_check", "input": username, "ts": pretty_now(), "sites": []}
+    for username, res in _run_checks(((u, s) for u in by_user for s in sites), concurrency, verify_tls):
+        by_user[username]["sites"].append(res)
+    for res in by_user.values():
+        res["bytes_read"] = sum(s["bytes"] for s in res["sites"])
+    return list(by_user.values())
+
+async def module_username_check_async(username, sites=None, compact=False, client=None):
+    """Versión asyncio de module_username_check; la concurrencia la limita el client"""
     results = {"module": "username_check", "input": username, "ts": pretty_now(), "sites": []}
-    def check_site(pattern):
-        url = pattern.format(username=username)
-        time.sleep(__import__("random").uniform(0.2, 0.5))
-        try:
-            r = requests.head(url, timeout=8, verify=verify_tls)
-            exists = r.status_code == 200
-        except Exception:
-            exists = None
-        return {"url": url, "exists": exists}
-    with ThreadPoolExecutor(max_workers=concurrency) as ex:
-        futs = [ex.submit(check_site, p) for p in sites]
-        for f in as_completed(futs):
-            results["sites"].append(f.result())
-    return results
\ No newline at end of file
+    async def check(site):
+        url = _site_url(site, username)
+        await _host_limiter.acquire_async(urlparse(url).hostname)
+        if site["strategy"] == "marker":
+            scanner = _MarkerScanner(site)
+            r = await client.get_stream(url, timeout=SITE_TIMEOUT, max_bytes=site["max_bytes"], on_chunk=scanner,
+                                        headers={"Range": f"bytes=0-{site['max_bytes'] - 1}"}, allow_redirects=False)
+            return _marker_result(site, url, r, scanner)
+        r = None
+        if site["method"] == "HEAD":
+            r = await client.head(url, timeout=SITE_TIMEOUT, allow_redirects=False)
+        if r is None or r.get("status_code") in HEAD_REJECTED:
+            r = await client.get_stream(url, timeout=SITE_TIMEOUT, max_bytes=1, allow_redirects=False)
+        if "error" in r:
+            return _site_result(site, url, None)
+        return _verdict_result(site, url, r)
+    for coro in asyncio.as_completed([check(s) for s in _resolve_sites(sites)]):
+        results["sites"].append(await coro)
+    results["bytes_read"] = sum(s["bytes"] for s in results["sites"])
+    return results
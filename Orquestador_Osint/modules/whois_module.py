@@ -1,3 +1,4 @@
+import asyncio
 import whois
 from utils.helpers import pretty_now
 
@@ -26,4 +27,8 @@ def module_whois(domain, summary: bool = False):
             out["raw_text"] = w.text if hasattr(w, 'text') else None
     except Exception as e:
         out["error"] = str(e)
-    return out
\ No newline at end of file
+    return out
+
+async def module_whois_async(domain, summary: bool = False):
+    """python-whois es bloqueante: se ejecuta en el pool de hilos por defecto del loop"""
+    return await asyncio.to_thread(module_whois, domain, summary)
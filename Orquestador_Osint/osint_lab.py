@@ -1,71 +1,210 @@
 import argparse
+import asyncio
+import itertools
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
 
-from modules.whois_module import module_whois
-from modules.dns_module import module_dns
-from modules.http_meta_module import module_http_meta
-from modules.username_check_module import module_username_check
-from modules.phone_module import module_phone_lookup
-from utils.helpers import pretty_now
+from utils.helpers import POOL_MAXSIZE, RETRY_TOTAL, JsonlWriter, configure_session, pretty_now, session_stats
+from utils.async_http import MAX_INFLIGHT
+from modules.http_meta_module import PROBE_DEADLINE, http_meta_stats
+from modules.username_check_module import HOST_RATE, set_host_rate
+from modules.shodan_module import module_shodan_hosts
+from utils.shodan_client import SHODAN_API_URL, SHODAN_RATE, configure_shodan
+from utils.cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ResultCache
+from utils.pipeline import (MAX_WORKERS, TARGET_TYPES, AsyncEngine, build_async_tasks, build_tasks, iter_tasks,
+                            load_targets, run_tasks, run_tasks_async, warn_invalid_target)
 
-MAX_WORKERS = 6
+def _cli_targets(args):
+    targets = []
+    if args.domain:
+        targets.append(("domain", args.domain.strip()))
+    if args.username:
+        targets.append(("username", args.username))
+    if args.phone:
+        targets.append(("phone", args.phone))
+    return targets
+
+def _load_targets(args, summary):
+    """load_targets de --targets-file; las líneas inválidas se avisan y quedan en summary["invalid_targets"]"""
+    def invalid(message):
+        summary.setdefault("invalid_targets", []).append(message)
+        warn_invalid_target(message)
+    return load_targets(args.targets_file, default_type=args.targets_type, on_invalid=invalid)
 
-def run_pipeline(args):
+def _shodan_enricher(args, deliver):
+    """
+    Envuelve deliver para anotar los registros A de los resultados dns. Devuelve
+    (on_result, enrich): enrich() consulta todas esas IPs en Shodan de una vez
+    (--shodan-enrich) y entrega el resultado como uno más.
+    """
+    if not getattr(args, "shodan_enrich", False):
+        return deliver, lambda: None
+    # Solo las IPs distintas: en lotes jsonl no se guarda nada más de los resultados
+    ips = set()
+    
+    def on_result(target, result):
+        if result.get("module") == "dns":
+            a = (result.get("records") or {}).get("A")
+            if isinstance(a, list):
+                ips.update(a)
+        deliver(target, result)
+    
+    def enrich():
+        if ips:
+            deliver({"type": "ips", "value": f"{len(ips)} IPs"}, module_shodan_hosts(sorted(ips), api_key=args.shodan_key))
+    
+    return on_result, enrich
+
+def run_pipeline(args, on_result=None):
+    """
+    Ejecuta los módulos de todos los objetivos.
+
+    Si se pasa on_result(target, result), cada resultado se entrega en cuanto
+    termina y no se acumula en summary["results"].
+    """
     summary = {"target": {}, "results": [], "started": pretty_now()}
     
-    if args.domain:
-        domain = args.domain.strip()
-        summary["target"]["domain"] = domain
-        tasks = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-            tasks.append(ex.submit(module_whois, domain, args.summary))
-            tasks.append(ex.submit(module_dns, domain, args.summary))
-            tasks.append(ex.submit(module_http_meta, domain, args.summary))
-            for fut in as_completed(tasks):
-                try:
-                    summary["results"].append(fut.result())
-                except Exception as e:
-                    summary["results"].append({"module_error": str(e)})
+    targets = _cli_targets(args)
+    for ty, value in targets:
+        summary["target"][ty] = value
+    tasks = [task for ty, value in targets for task in build_tasks(ty, value, args)]
     
-    if args.username:
-        summary["target"]["username"] = args.username
-        compact = args.compact or args.summary
-        ures = module_username_check(args.username, compact=compact)
-        summary["results"].append(ures)
+    if args.targets_file:
+        summary["target"]["targets_file"] = args.targets_file
+        tasks = itertools.chain(tasks, iter_tasks(_load_targets(args, summary), args))
     
-    if args.phone:
-        summary["target"]["phone"] = args.phone
-        phone_res = module_phone_lookup(args.phone, args.numverify_key)
-        summary["results"].append(phone_res)
+    def collect(target, result):
+        summary["results"].append(result)
+    
+    deliver, enrich = _shodan_enricher(args, on_result or collect)
+    summary["tasks"] = run_tasks(tasks, deliver, max_workers=args.max_workers)
+    enrich()
+    summary["http_stats"] = session_stats()
+    summary["http_meta_stats"] = http_meta_stats()
+    if getattr(args, "cache", None) is not None:
+        summary["cache_stats"] = args.cache.stats()
+    summary["finished"] = pretty_now()
+    return summary
+
+async def run_pipeline_async(args, on_result=None):
+    """Igual que run_pipeline pero sobre el motor asyncio (--engine async)"""
+    summary = {"target": {}, "results": [], "started": pretty_now()}
     
+    targets = _cli_targets(args)
+    for ty, value in targets:
+        summary["target"][ty] = value
+    if args.targets_file:
+        summary["target"]["targets_file"] = args.targets_file
+        targets = itertools.chain(targets, _load_targets(args, summary))
     
+    def collect(target, result):
+        summary["results"].append(result)
+    
+    deliver, enrich = _shodan_enricher(args, on_result or collect)
+    async with AsyncEngine(max_inflight=args.max_inflight) as engine:
+        tasks = (task for ty, value in targets for task in build_async_tasks(ty, value, args, engine))
+        summary["tasks"] = await run_tasks_async(tasks, deliver, max_inflight=args.max_inflight)
+    await asyncio.to_thread(enrich)
+    summary["http_meta_stats"] = http_meta_stats()
+    if getattr(args, "cache", None) is not None:
+        summary["cache_stats"] = args.cache.stats()
     summary["finished"] = pretty_now()
     return summary
 
+def _run(args, on_result=None):
+    if args.engine == "async":
+        return asyncio.run(run_pipeline_async(args, on_result=on_result))
+    return run_pipeline(args, on_result=on_result)
+
+def run_streaming(args):
+    """Modo --out-format jsonl: escribe cada resultado en cuanto su future termina"""
+    fp = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    writer = JsonlWriter(fp)
+    
+    def emit(target, result):
+        writer.write({"target": target, "module": result.get("module"), "result": result})
+    
+    # Los subdominios se emiten uno a uno en cuanto resuelven, antes del resultado completo
+    args.on_subdomain_hit = lambda hit: writer.write(
+        {"target": {"type": "domain", "value": hit["domain"]}, "module": "subdomains", "hit": hit})
+    
+    try:
+        summary = _run(args, on_result=emit)
+    finally:
+        writer.close()
+        if args.out:
+            fp.close()
+    if args.out and not args.quiet:
+        print(f"{writer.lines} resultados guardados en {args.out} ({summary['started']} - {summary['finished']})")
+        if "http_stats" in summary:
+            print(f"HTTP: {summary['http_stats']}")
+
 def build_parser():
     p = argparse.ArgumentParser(description="osint_lab - modular OSINT (ethical use only)")
     p.add_argument("--domain", "-d", help="Domain to analyze")
     p.add_argument("--username", "-u", help="Username to check")
     p.add_argument("--phone", help="Número de teléfono")
+    p.add_argument("--targets-file", "-t", help="Fichero de objetivos: uno por línea o JSONL con campo 'type'")
+    p.add_argument("--targets-type", choices=TARGET_TYPES,
+                   help="Tipo de las líneas en texto plano de --targets-file (por defecto se deduce; "
+                        "p.ej. 'john.doe' se tomaría por dominio)")
     p.add_argument("--numverify-key", help="API key de numverify")
+    p.add_argument("--shodan-key", help="API key de Shodan (objetivos de tipo ip)")
+    p.add_argument("--shodan-enrich", action="store_true",
+                   help="Consultar en Shodan todas las IPs de los registros A de los dominios al terminar")
+    p.add_argument("--shodan-rate", type=float, default=SHODAN_RATE, help="Peticiones por segundo a la API de Shodan")
+    p.add_argument("--shodan-url", default=SHODAN_API_URL, help="URL base de la API de Shodan (p.ej. un servidor de pruebas)")
     p.add_argument("--out", "-o", help="Output JSON file")
+    p.add_argument("--out-format", choices=["json", "jsonl"], default="json",
+                   help="json: un único reporte al final; jsonl: una línea por resultado de módulo según termina")
     p.add_argument("--summary", action="store_true", help="Modo resumen")
     p.add_argument("--compact", action="store_true", help="Salida compacta")
     p.add_argument("--quiet", action="store_true", help="Sin mensajes por pantalla")
-    p.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    p.add_argument("--max-workers", type=int, default=MAX_WORKERS,
+                   help="Tamaño del pool compartido por todo el lote")
+    p.add_argument("--pool-size", type=int, default=POOL_MAXSIZE,
+                   help="Conexiones keep-alive por host en la sesión HTTP compartida")
+    p.add_argument("--retries", type=int, default=RETRY_TOTAL,
+                   help="Reintentos con backoff ante errores de red y respuestas 429/5xx")
+    p.add_argument("--subdomains", action="store_true", help="Enumerar subdominios de cada dominio por fuerza bruta")
+    p.add_argument("--wordlist", help="Wordlist de subdominios (por defecto data/subdomains.txt)")
+    p.add_argument("--dns-rate", type=float, help="Consultas DNS por segundo como máximo en la enumeración")
+    p.add_argument("--http-deadline", type=float, default=PROBE_DEADLINE,
+                   help="Segundos como máximo para encontrar una URL que responda en http_meta")
+    p.add_argument("--sites-file", help="Fichero JSON de sitios para --username (por defecto data/username_sites.json)")
+    p.add_argument("--host-rate", type=float, default=HOST_RATE, help="Peticiones por segundo y host al comprobar usuarios")
+    p.add_argument("--no-cache", action="store_true", help="No leer ni escribir la caché de resultados")
+    p.add_argument("--refresh", action="store_true", help="Ignorar la caché al leer pero actualizarla con los nuevos resultados")
+    p.add_argument("--cache-path", default=DEFAULT_CACHE_PATH, help="Fichero SQLite de la caché")
+    p.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                   help="Tamaño máximo de la caché antes de expulsar entradas")
+    p.add_argument("--whois-ttl", type=int, help="TTL de WHOIS en segundos")
+    p.add_argument("--shodan-ttl", type=int, help="TTL de Shodan en segundos")
+    p.add_argument("--engine", choices=["threads", "async"], default="threads",
+                   help="threads: ThreadPoolExecutor; async: asyncio con miles de peticiones en vuelo")
+    p.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT,
+                   help="Peticiones/tareas simultáneas con --engine async")
     return p
 
 def main():
-    global MAX_WORKERS
     args = build_parser().parse_args()
 
-    if not (args.domain or args.username or args.phone):
-        print("Debe especificar al menos --domain, --username o --phone")
+    if not (args.domain or args.username or args.phone or args.targets_file):
+        print("Debe especificar al menos --domain, --username, --phone o --targets-file")
+        return
+    
+    configure_session(pool_maxsize=args.pool_size, retries=args.retries)
+    set_host_rate(args.host_rate)
+    configure_shodan(rate=args.shodan_rate, base_url=args.shodan_url)
+    args.cache = None if args.no_cache else ResultCache(
+        args.cache_path, max_bytes=args.cache_max_mb * 1024 * 1024,
+        ttls={"whois": args.whois_ttl, "shodan_host": args.shodan_ttl})
+    
+    if args.out_format == "jsonl":
+        run_streaming(args)
         return
     
-    MAX_WORKERS = args.max_workers
-    report = run_pipeline(args)
+    report = _run(args)
     
     if args.out:
         with open(args.out, "w", encoding="utf-8") as f:
@@ -76,4 +215,4 @@ def main():
         print(json.dumps(report, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,41 @@
+from utils.case_graph import CaseGraph
+
+
+def _username_scan(username, url):
+    return {"results": [{"module": "username_check", "input": username,
+                         "sites": [{"site": "GitHub", "url": url, "exists": True}]}]}
+
+
+def _dns_scan(domain, ip):
+    return {"results": [{"module": "dns", "input": domain, "records": {"A": [ip], "NS": [f"ns1.{domain}"]}}]}
+
+
+def _snapshot(case):
+    G = case.graph
+    return ({n: (d["type"], d["label"], d["seen"]) for n, d in G.nodes(data=True)},
+            {(s, t): (sorted(d["relationships"]), d["seen"]) for s, t, d in G.edges(data=True)})
+
+
+def test_reloaded_case_matches_live_graph(tmp_path):
+    path = str(tmp_path / "cases.sqlite3")
+    live = CaseGraph("c1", path)
+    # github.com aparece primero como extremo de una relación (tipo 'unknown') y después como dominio
+    live.add_result("r1", _username_scan("alice", "https://github.com/alice"))
+    assert live.graph.nodes["github.com"]["type"] == "unknown"
+    live.add_result("r2", _dns_scan("github.com", "140.82.121.4"))
+    live.add_result("r3", _username_scan("bob", "https://github.com/bob"))
+    assert live.graph.nodes["github.com"]["type"] == "domains"
+
+    reloaded = CaseGraph("c1", path)
+    assert _snapshot(reloaded) == _snapshot(live)
+    live.close()
+    assert _snapshot(live) == _snapshot(reloaded)
+
+
+def test_sees_results_added_by_another_instance(tmp_path):
+    path = str(tmp_path / "cases.sqlite3")
+    a, b = CaseGraph("c1", path), CaseGraph("c1", path)
+    a.add_result("r1", _dns_scan("example.com", "93.184.216.34"))
+    assert b.stats()["entities"] == a.stats()["entities"]
+    b.add_result("r2", _dns_scan("example.org", "93.184.216.35"))
+    assert _snapshot(a) == _snapshot(b)
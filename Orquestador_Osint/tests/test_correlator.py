@@ -0,0 +1,34 @@
+import networkx as nx
+
+from utils.correlator import collapse_leaves
+
+
+def _graph(n_in, n_out):
+    G = nx.DiGraph()
+    G.add_node("example.com", type="domains")
+    G.add_node("other.com", type="domains")
+    G.add_edge("example.com", "other.com", relationship="link")
+    for i in range(n_out):
+        G.add_node(f"10.0.0.{i}", type="ips")
+        G.add_edge("example.com", f"10.0.0.{i}", relationship="resolves_to")
+    for i in range(n_in):
+        G.add_node(f"10.0.1.{i}", type="ips")
+        G.add_edge(f"10.0.1.{i}", "example.com", relationship="points_to")
+    return G
+
+
+def test_incoming_and_outgoing_groups_stay_separate():
+    H = collapse_leaves(_graph(n_in=4, n_out=6), min_group=3)
+    groups = {n: d for n, d in H.nodes(data=True) if d.get("collapsed")}
+    assert sorted(d["collapsed"] for d in groups.values()) == [4, 6]
+    out_group = next(n for n, d in groups.items() if d["collapsed"] == 6)
+    in_group = next(n for n, d in groups.items() if d["collapsed"] == 4)
+    assert H.edges["example.com", out_group]["relationship"] == "resolves_to"
+    assert H.edges[in_group, "example.com"]["relationship"] == "points_to"
+    assert not H.has_edge(out_group, "example.com") and not H.has_edge("example.com", in_group)
+
+
+def test_small_groups_are_kept():
+    H = collapse_leaves(_graph(n_in=2, n_out=6), min_group=3)
+    assert H.has_edge("10.0.1.0", "example.com") and H.has_edge("10.0.1.1", "example.com")
+    assert sum(1 for _, d in H.nodes(data=True) if d.get("collapsed")) == 1
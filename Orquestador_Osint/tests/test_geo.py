@@ -0,0 +1,49 @@
+import numpy as np
+
+from utils.geo import cluster_points, haversine_km
+
+
+def _brute_force(lats, lons, radius_km):
+    # Enlace simple O(n²) con haversine: la referencia que cluster_points debe reproducir
+    n = len(lats)
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(n):
+        d = haversine_km(lats[i], lons[i], lats, lons)
+        for j in np.nonzero(d <= radius_km)[0]:
+            parent[find(int(j))] = find(i)
+    return [find(i) for i in range(n)]
+
+
+def _same_partition(a, b):
+    pairs = set(zip(a, b))
+    return len(pairs) == len(set(a)) == len(set(b))
+
+
+def test_north_south_neighbours_share_cluster():
+    # 0.191 km en dirección norte-sur a 55°N: la proyección con la latitud de cada punto los separaba
+    lats = np.array([55.0, 55.0 + 0.191 / 111.195])
+    lons = np.array([170.0, 170.0])
+    assert len(set(cluster_points(lats, lons, radius_km=0.25))) == 1
+
+
+def test_matches_brute_force_at_high_latitude():
+    rng = np.random.default_rng(7)
+    for _ in range(30):
+        n = int(rng.integers(20, 120))
+        lat0, lon0 = rng.uniform(50, 89), rng.uniform(-180, 180)
+        lats = lat0 + rng.normal(0, 0.01, n)
+        lons = lon0 + rng.normal(0, 0.01 / np.cos(np.radians(lat0)), n)
+        lons = (lons + 180) % 360 - 180
+        lats = np.clip(lats, -90, 90)
+        labels = cluster_points(lats, lons, radius_km=0.25)
+        assert _same_partition(labels.tolist(), _brute_force(lats, lons, 0.25))
+
+
+def test_antimeridian():
+    assert len(set(cluster_points([10.0, 10.0], [179.9995, -179.9995], radius_km=0.25))) == 1
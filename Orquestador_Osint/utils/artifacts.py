@@ -0,0 +1,195 @@
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 7 * 86400
+META_FILE = "meta.json"
+# Como mucho una pasada de evict() automática por intervalo; lo usado en ese intervalo no se elimina
+EVICT_INTERVAL = 60
+# Generaciones a medias (de un proceso que murió) que se dan por abandonadas
+STALE_TMP = 3600
+
+# Solo se tocan los directorios que crea la caché: <tipo>-<clave> y los temporales .<tipo>-xxxx
+_ENTRY_RE = re.compile(r"^[\w-]+-[0-9a-f]{40}$")
+_TMP_RE = re.compile(r"^\.[\w-]+-[\w]+$")
+
+
+def content_hash(data, exclude=("pdf_id", "content_hash")):
+    """SHA-256 del resultado serializado de forma estable (sin los campos que no son contenido)"""
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k not in exclude}
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Ficheros generados (PDF, grafos, CSV) guardados en disco por (tipo, hash del
+    contenido, versión del generador). Cada artefacto es un subdirectorio
+    <tipo>-<clave> con sus ficheros y un meta.json con lo que devolvió el generador.
+
+    Se eliminan primero los que superan ttl y después los menos usados hasta quedar
+    por debajo de max_bytes. El resto del contenido del directorio no se toca.
+    Varios procesos pueden compartir el directorio.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        self._last_evict = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind, content_key, version):
+        return hashlib.sha256(f"{kind}\0{version}\0{content_key}".encode("utf-8")).hexdigest()[:40]
+
+    def _dir(self, kind, key):
+        return os.path.join(self.directory, f"{kind}-{key}")
+
+    def lookup(self, kind, content_key, version):
+        """(meta, etag) si el artefacto ya existe; None si no"""
+        key = self.key(kind, content_key, version)
+        path = self._dir(kind, key)
+        try:
+            with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            # Eliminado (por evict de este u otro proceso) justo después de leerlo
+            return None
+        with self._lock:
+            self.hits += 1
+        return meta, key
+
+    def get_or_create(self, kind, content_key, version, build):
+        """
+        Devuelve (meta, etag, hit). Si no existe, llama a build(directorio) para
+        generar los ficheros dentro de directorio; su valor de retorno (serializable
+        en JSON) se guarda como meta. Dos peticiones simultáneas del mismo artefacto
+        lo generan una sola vez.
+        """
+        found = self.lookup(kind, content_key, version)
+        if found is not None:
+            return found[0], found[1], True
+
+        key = self.key(kind, content_key, version)
+        with self._lock:
+            lock = self._building.setdefault(key, threading.Lock())
+        with lock:
+            found = self.lookup(kind, content_key, version)
+            if found is not None:
+                return found[0], found[1], True
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix=f".{kind}-")
+            try:
+                meta = build(tmp)
+                meta = _relocate(meta, tmp, self._dir(kind, key))
+                with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False, default=str)
+                try:
+                    os.replace(tmp, self._dir(kind, key))
+                except OSError as e:
+                    # Otro proceso lo generó a la vez y ganó: se usa el suyo
+                    if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                        raise
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    found = self.lookup(kind, content_key, version)
+                    if found is None:
+                        raise
+                    return found[0], found[1], True
+            except BaseException:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        with self._lock:
+            self.misses += 1
+            due = time.time() - self._last_evict >= EVICT_INTERVAL
+            if due:
+                self._last_evict = time.time()
+        if due:
+            self.evict()
+        return meta, key, False
+
+    def evict(self):
+        """Aplica ttl y max_bytes; devuelve el nº de artefactos eliminados"""
+        now = time.time()
+        entries = []
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            managed = _ENTRY_RE.match(name)
+            if not managed and not _TMP_RE.match(name):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isdir(path):
+                continue
+            if not managed:
+                if now - st.st_mtime > STALE_TMP:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            if now - st.st_mtime > self.ttl:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+                continue
+            entries.append((st.st_mtime, path, _size(path)))
+        total = sum(size for _, _, size in entries)
+        for mtime, path, size in sorted(entries):
+            # Los usados hace poco pueden estar sirviéndose ahora mismo
+            if total <= self.max_bytes or now - mtime < EVICT_INTERVAL:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"directory": self.directory, "bytes": _size(self.directory), "hits": hits, "misses": misses}
+
+
+def _size(path):
+    if not os.path.isdir(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _relocate(meta, old, new):
+    # Las rutas que devuelve el generador apuntan al directorio temporal; se reescriben al definitivo
+    if isinstance(meta, str):
+        return new + meta[len(old):] if meta.startswith(old) else meta
+    if isinstance(meta, dict):
+        return {k: _relocate(v, old, new) for k, v in meta.items()}
+    if isinstance(meta, list):
+        return [_relocate(v, old, new) for v in meta]
+    return meta
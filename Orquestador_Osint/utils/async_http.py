@@ -0,0 +1,90 @@
+import asyncio
+
+from utils.helpers import DEFAULT_TIMEOUT, STREAM_CHUNK, USER_AGENT, safe_request_get, safe_request_head, stream_request_get
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+MAX_INFLIGHT = 1000
+PER_HOST_LIMIT = 8
+
+
+class AsyncHttpClient:
+    """
+    Cliente HTTP asíncrono compartido por todos los módulos async.
+
+    Mantiene hasta `limit` peticiones en vuelo y como mucho `per_host`
+    conexiones simultáneas contra un mismo host. Devuelve los mismos dicts
+    que safe_request_get/safe_request_head. Sin aiohttp instalado, delega en
+    las funciones síncronas ejecutadas en hilos.
+    """
+
+    def __init__(self, limit=MAX_INFLIGHT, per_host=PER_HOST_LIMIT, verify_tls=True):
+        self.limit = limit
+        self.per_host = per_host
+        self.verify_tls = verify_tls
+        self._session = None
+        self._threads = asyncio.Semaphore(min(limit, 64))
+
+    async def __aenter__(self):
+        if AIOHTTP_AVAILABLE:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.per_host,
+                                             ssl=bool(self.verify_tls))
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  headers={"User-Agent": USER_AGENT})
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, url, params=None, timeout=DEFAULT_TIMEOUT, allow_redirects=True, read_body=True):
+        try:
+            async with self._session.request(method, url, params=params, allow_redirects=allow_redirects,
+                                             timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                out = {"status_code": r.status, "url": str(r.url), "ok": r.status < 400,
+                       "headers": dict(r.headers)}
+                if read_body:
+                    out["text"] = await r.text(errors="replace")
+                return out
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return {"error": str(e) or e.__class__.__name__}
+
+    async def get(self, url, params=None, timeout=DEFAULT_TIMEOUT, allow_redirects=True):
+        if self._session is None:
+            async with self._threads:
+                return await asyncio.to_thread(safe_request_get, url, timeout, params, allow_redirects)
+        return await self._request("GET", url, params=params, timeout=timeout, allow_redirects=allow_redirects)
+
+    async def head(self, url, timeout=DEFAULT_TIMEOUT, allow_redirects=True):
+        if self._session is None:
+            async with self._threads:
+                return await asyncio.to_thread(safe_request_head, url, timeout, allow_redirects)
+        return await self._request("HEAD", url, timeout=timeout, allow_redirects=allow_redirects, read_body=False)
+
+    async def get_stream(self, url, timeout=DEFAULT_TIMEOUT, max_bytes=65536, on_chunk=None, headers=None,
+                         allow_redirects=True):
+        """Equivalente async de helpers.stream_request_get"""
+        if self._session is None:
+            async with self._threads:
+                return await asyncio.to_thread(stream_request_get, url, timeout, max_bytes, on_chunk, headers,
+                                               allow_redirects, self.verify_tls)
+        buf = bytearray()
+        truncated = False
+        try:
+            async with self._session.get(url, headers=headers, allow_redirects=allow_redirects,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                async for chunk in r.content.iter_chunked(STREAM_CHUNK):
+                    buf += chunk
+                    if len(buf) >= max_bytes or (on_chunk and on_chunk(chunk)):
+                        truncated = True
+                        break
+                text = bytes(buf[:max_bytes]).decode(r.charset or "utf-8", errors="replace")
+                return {"status_code": r.status, "url": str(r.url), "ok": r.status < 400,
+                        "headers": dict(r.headers), "text": text, "bytes_read": len(buf), "truncated": truncated}
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return {"error": str(e) or e.__class__.__name__}
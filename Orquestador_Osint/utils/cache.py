@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.environ.get("OSINT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "osint_cache.sqlite3"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Cada cuántas escrituras se comprueba el tamaño total de la caché
+EVICT_EVERY = 50
+
+# TTL por módulo (segundos). DNS usa el TTL mínimo de los registros y este valor
+# solo si la respuesta no lo trae (p.ej. NXDOMAIN o timeouts).
+DEFAULT_TTLS = {
+    "whois": 3 * 86400,
+    "dns": 300,
+    "http_meta": 3600,
+    "username_check": 6 * 3600,
+    "phone_lookup": 30 * 86400,
+    "shodan_host": 86400,
+    "subdomains": 86400,
+    # Resultados EXIF por SHA-256 del fichero: el contenido no cambia
+    "exif": 30 * 86400,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    module TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed);
+CREATE INDEX IF NOT EXISTS results_expires ON results(expires);
+"""
+
+
+def normalize_input(module, value):
+    """Normaliza la entrada para que 'Example.com.' y 'example.com' compartan entrada"""
+    value = str(value).strip()
+    if module in ("whois", "dns", "http_meta", "subdomains"):
+        return value.lower().rstrip(".")
+    if module == "phone_lookup":
+        return re.sub(r"[\s().-]", "", value)
+    return value
+
+
+def make_key(module, value, options=None):
+    raw = json.dumps([module, normalize_input(module, value), options or {}], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _is_cacheable(result):
+    return isinstance(result, dict) and "error" not in result and "module_error" not in result
+
+
+class ResultCache:
+    """
+    Caché persistente (SQLite) de resultados de módulos.
+
+    Las entradas se indexan por (módulo, entrada normalizada, opciones relevantes),
+    caducan según el TTL del módulo y, cuando la base de datos supera max_bytes,
+    se eliminan primero las caducadas y después las menos usadas recientemente.
+    Se puede compartir entre hilos y entre procesos (modo WAL).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update({k: v for k, v in (ttls or {}).items() if v is not None})
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def ttl_for(self, module, result):
+        # El TTL de los registros manda aunque sea 0 (no cachear); set() ignora ttl <= 0
+        if module == "dns" and isinstance(result, dict) and result.get("min_ttl") is not None:
+            return result["min_ttl"]
+        return self.ttls.get(module, 3600)
+
+    def get(self, module, value, options=None):
+        key = make_key(module, value, options)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM results WHERE key = ? AND expires > ?",
+                                     (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        result = json.loads(row[0])
+        result["from_cache"] = True
+        return result
+
+    def set(self, module, value, result, options=None, ttl=None):
+        if not _is_cacheable(result):
+            return
+        ttl = ttl if ttl is not None else self.ttl_for(module, result)
+        if ttl <= 0:
+            return
+        data = json.dumps(result, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, module, value, size, created, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (make_key(module, value, options), module, data, len(data), now, now + ttl, now))
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict_locked()
+
+    def call(self, module, value, fn, *args, options=None, refresh=False, **kwargs):
+        """Devuelve el resultado cacheado de fn(*args, **kwargs) o lo calcula y lo guarda"""
+        if not refresh:
+            cached = self.get(module, value, options)
+            if cached is not None:
+                return cached
+        result = fn(*args, **kwargs)
+        self.set(module, value, result, options)
+        return result
+
+    async def call_async(self, module, value, factory, options=None, refresh=False):
+        """Equivalente de call para el motor async: factory() crea la corrutina"""
+        if not refresh:
+            cached = self.get(module, value, options)
+            if cached is not None:
+                return cached
+        result = await factory()
+        self.set(module, value, result, options)
+        return result
+
+    def evict(self):
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        removed = self._conn.execute("DELETE FROM results WHERE expires <= ?", (time.time(),)).rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            rows = self._conn.execute("SELECT key, size FROM results ORDER BY accessed ASC").fetchall()
+            victims = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM results WHERE key = ?", victims)
+            removed += len(victims)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,325 @@
+import ipaddress
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from urllib.request import pathname2url
+
+import networkx as nx
+
+from utils.correlator import EntitySet
+from utils.geo import GeoIndex, image_points
+
+DEFAULT_CASE_PATH = os.environ.get("OSINT_CASE_PATH", os.path.join(tempfile.gettempdir(), "osint_cases.sqlite3"))
+# Casos abiertos a la vez por proceso (cada uno con su conexión y su grafo en memoria)
+CASES_MAX = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS case_results (
+    case_id TEXT NOT NULL,
+    result_id TEXT NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (case_id, result_id)
+);
+CREATE TABLE IF NOT EXISTS case_entities (
+    case_id TEXT NOT NULL,
+    value TEXT NOT NULL,
+    type TEXT NOT NULL,
+    label TEXT NOT NULL,
+    seen INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (case_id, value)
+);
+CREATE TABLE IF NOT EXISTS case_edges (
+    case_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    relationship TEXT NOT NULL,
+    seen INTEGER NOT NULL,
+    PRIMARY KEY (case_id, source, target, relationship)
+);
+CREATE TABLE IF NOT EXISTS case_points (
+    case_id TEXT NOT NULL,
+    result_id TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    item TEXT
+);
+CREATE INDEX IF NOT EXISTS case_points_case ON case_points(case_id, lat);
+"""
+
+
+def normalize_entity(entity_type, value):
+    """
+    Forma canónica de una entidad para que la misma no aparezca dos veces:
+    'Example.COM.' -> 'example.com', '+34 600-11-22-33' -> '+34600112233', etc.
+    """
+    value = str(value).strip()
+    if entity_type in ("domains", "nameservers"):
+        return value.lower().rstrip(".")
+    if entity_type in ("emails", "usernames"):
+        return value.lower()
+    if entity_type == "ips":
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return value
+    if entity_type == "phones":
+        return ("+" if value.startswith("+") else "") + re.sub(r"\D", "", value)
+    return " ".join(value.split())
+
+
+class CaseGraph:
+    """
+    Grafo de entidades y relaciones de un caso, acumulado sobre muchos escaneos.
+
+    Cada resultado se extrae una sola vez al añadirlo (add_result) y se fusiona con
+    lo que ya había, deduplicando entidades por su forma normalizada. El grafo se
+    persiste en SQLite y se mantiene en memoria como nx.DiGraph para las consultas;
+    si otro proceso (u otra instancia) añade escaneos al caso, se recarga al leerlo.
+
+    lock es reentrante: quien necesite varias lecturas coherentes entre sí (grafo,
+    entidades, geo_index) las hace con él tomado.
+    """
+
+    def __init__(self, case_id, path=DEFAULT_CASE_PATH):
+        self.case_id = case_id
+        self.path = path
+        self.lock = threading.RLock()
+        self._conn = None
+        self._graph = None
+        self._geo = None
+        # Nº de escaneos del caso que reflejan _graph/_geo
+        self._version = None
+
+    def _db(self):
+        # Se abre al usarla: close() la libera y la instancia sigue siendo válida
+        with self.lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.executescript(_SCHEMA)
+            return self._conn
+
+    def _stored_version(self):
+        # Los escaneos solo se añaden, así que su número identifica el estado del caso
+        return self._db().execute("SELECT COUNT(*) FROM case_results WHERE case_id = ?", (self.case_id,)).fetchone()[0]
+
+    def _check_version(self):
+        version = self._stored_version()
+        if version != self._version:
+            self._graph = None
+            self._geo = None
+            self._version = version
+
+    # --- Lectura ------------------------------------------------------------
+
+    @property
+    def graph(self):
+        """nx.DiGraph del caso (se carga de SQLite la primera vez y cuando el caso cambia fuera)"""
+        with self.lock:
+            self._check_version()
+            if self._graph is None:
+                self._graph = self._load_graph()
+            return self._graph
+
+    def _load_graph(self):
+        G = nx.DiGraph()
+        for value, ty, label, seen in self._db().execute(
+                "SELECT value, type, label, seen FROM case_entities WHERE case_id = ?", (self.case_id,)):
+            G.add_node(value, type=ty, label=label, seen=seen)
+        for source, target, rel, seen in self._db().execute(
+                "SELECT source, target, relationship, seen FROM case_edges WHERE case_id = ? ORDER BY rowid",
+                (self.case_id,)):
+            self._add_edge(G, source, target, rel, seen)
+        return G
+
+    @staticmethod
+    def _add_edge(G, source, target, rel, seen):
+        for node in (source, target):
+            if node not in G:
+                G.add_node(node, type="unknown", label=node[:30], seen=0)
+        if G.has_edge(source, target):
+            # DiGraph: una arista por par; se conservan todas las relaciones
+            data = G.edges[source, target]
+            if rel not in data["relationships"]:
+                data["relationships"].append(rel)
+            data["seen"] += seen
+        else:
+            G.add_edge(source, target, relationship=rel, relationships=[rel], seen=seen)
+
+    def entities(self):
+        """dict tipo -> set de valores, como el primer valor de extract_entities"""
+        out = {}
+        for node, data in self.graph.nodes(data=True):
+            if data["type"] != "unknown":
+                out.setdefault(data["type"], set()).add(node)
+        return out
+
+    def relationships(self):
+        """Lista de (origen, destino, relación) del caso"""
+        return [(s, t, rel) for s, t, data in self.graph.edges(data=True) for rel in data["relationships"]]
+
+    def result_ids(self):
+        with self.lock:
+            return [r for (r,) in self._db().execute(
+                "SELECT result_id FROM case_results WHERE case_id = ? ORDER BY added", (self.case_id,))]
+
+    def __contains__(self, result_id):
+        with self.lock:
+            return self._db().execute("SELECT 1 FROM case_results WHERE case_id = ? AND result_id = ?",
+                                      (self.case_id, result_id)).fetchone() is not None
+
+    def neighbors(self, value, entity_type=None):
+        """Entidades conectadas (en cualquier sentido) con value"""
+        node = normalize_entity(entity_type, value) if entity_type else value
+        G = self.graph
+        if node not in G:
+            return []
+        return [{"entity": n, "type": G.nodes[n]["type"],
+                 "relationships": (G.edges[node, n] if G.has_edge(node, n) else G.edges[n, node])["relationships"]}
+                for n in set(G.successors(node)) | set(G.predecessors(node))]
+
+    @property
+    def geo_index(self):
+        """GeoIndex con las fotos geolocalizadas de todos los escaneos del caso"""
+        with self.lock:
+            self._check_version()
+            if self._geo is None:
+                self._geo = GeoIndex(self._db().execute(
+                    "SELECT lat, lon, item FROM case_points WHERE case_id = ?", (self.case_id,)).fetchall())
+            return self._geo
+
+    def stats(self):
+        with self.lock:
+            G = self.graph
+            return {"case_id": self.case_id, "results": len(self.result_ids()),
+                    "entities": G.number_of_nodes(), "relationships": G.number_of_edges(),
+                    "images_with_gps": len(self.geo_index)}
+
+    # --- Escritura ----------------------------------------------------------
+
+    def add_result(self, result_id, osint_data):
+        """
+        Fusiona un resultado de escaneo en el caso. Un mismo result_id solo se
+        procesa una vez.
+
+        Returns:
+            False si el resultado ya estaba en el caso, True si se ha añadido
+        """
+        es = EntitySet.from_result(osint_data)
+        entities, relationships = es.entities, es.relationships
+        points = image_points(osint_data.get("results", []))
+        now = time.time()
+
+        # Valor original -> nodo normalizado (las relaciones usan los valores originales)
+        canon, nodes = {}, {}
+        for entity_type, values in entities.items():
+            for value in values:
+                node = normalize_entity(entity_type, value)
+                canon[value] = node
+                nodes.setdefault(node, (entity_type, str(value)[:30]))
+        edges = {}
+        for source, target, rel in relationships:
+            key = (canon.get(source, normalize_entity(None, source)), canon.get(target, normalize_entity(None, target)), rel)
+            edges[key] = edges.get(key, 0) + 1
+
+        with self.lock:
+            G = self.graph
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Escaneos añadidos por otros desde que se leyó el grafo: entonces no basta con fusionar
+                stale = self._stored_version() != self._version
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO case_results (case_id, result_id, added) VALUES (?, ?, ?)",
+                    (self.case_id, result_id, now))
+                if cur.rowcount == 0:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.executemany(
+                    "INSERT INTO case_entities (case_id, value, type, label, seen, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                    "ON CONFLICT (case_id, value) DO UPDATE SET seen = seen + 1, last_seen = excluded.last_seen, "
+                    # Igual que en el grafo en memoria: un nodo 'unknown' toma el tipo real al aparecer
+                    "type = CASE WHEN case_entities.type = 'unknown' THEN excluded.type ELSE case_entities.type END, "
+                    "label = CASE WHEN case_entities.type = 'unknown' THEN excluded.label ELSE case_entities.label END",
+                    [(self.case_id, node, ty, label, now, now) for node, (ty, label) in nodes.items()])
+                conn.executemany(
+                    "INSERT INTO case_edges (case_id, source, target, relationship, seen) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (case_id, source, target, relationship) DO UPDATE SET seen = seen + excluded.seen",
+                    [(self.case_id, s, t, rel, n) for (s, t, rel), n in edges.items()])
+                conn.executemany(
+                    "INSERT INTO case_points (case_id, result_id, lat, lon, item) VALUES (?, ?, ?, ?, ?)",
+                    [(self.case_id, result_id, lat, lon, item) for lat, lon, item in points])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            if stale:
+                # Se recargará entero de SQLite en la próxima lectura
+                self._version = None
+                self._graph = self._geo = None
+                return True
+            self._version += 1
+            for node, (ty, label) in nodes.items():
+                if node in G and G.nodes[node]["type"] != "unknown":
+                    G.nodes[node]["seen"] += 1
+                else:
+                    G.add_node(node, type=ty, label=label, seen=G.nodes[node]["seen"] + 1 if node in G else 1)
+            for (s, t, rel), n in edges.items():
+                self._add_edge(G, s, t, rel, n)
+            if points:
+                self._geo = None
+        return True
+
+    def close(self):
+        """Libera la conexión y el grafo en memoria; se reabren si se vuelve a usar"""
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._graph = self._geo = None
+            self._version = None
+
+
+_cases = OrderedDict()
+_cases_lock = threading.Lock()
+
+
+def get_case(case_id, path=DEFAULT_CASE_PATH):
+    """
+    CaseGraph compartido por proceso para case_id. Se mantienen abiertos los CASES_MAX
+    usados más recientemente; al salir del registro se cierra su conexión.
+    """
+    with _cases_lock:
+        case = _cases.get((path, case_id))
+        if case is None:
+            case = _cases[(path, case_id)] = CaseGraph(case_id, path)
+        _cases.move_to_end((path, case_id))
+        evicted = [_cases.popitem(last=False)[1] for _ in range(len(_cases) - CASES_MAX)]
+    for old in evicted:
+        # Espera a que termine quien lo esté usando con el lock tomado
+        old.close()
+    return case
+
+
+def case_exists(case_id, path=DEFAULT_CASE_PATH):
+    """True si el caso tiene algún escaneo; no abre ni registra el caso"""
+    with _cases_lock:
+        case = _cases.get((path, case_id))
+    if case is not None:
+        return bool(case.result_ids())
+    try:
+        with closing(sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, timeout=30)) as conn:
+            return conn.execute("SELECT 1 FROM case_results WHERE case_id = ? LIMIT 1", (case_id,)).fetchone() is not None
+    except sqlite3.OperationalError:
+        # Base de datos o tabla aún sin crear
+        return False
@@ -1,11 +1,37 @@
 import networkx as nx
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import re
+import threading
+import time
+
+from utils.geo import CLUSTER_RADIUS_KM, cluster_points, image_points, summarize_clusters
+
+# Cambiarlo invalida los grafos y exportaciones ya generados en la caché de artefactos
+GRAPH_VERSION = "1"
+
+def gps_clusters(points, radius_km=CLUSTER_RADIUS_KM):
+    """
+    Agrupa los puntos (lat, lon, fichero) de las fotos cercanas y etiqueta cada
+    cluster con su centroide en el mismo formato "lat, lon" que las ubicaciones.
+    """
+    if not points:
+        return []
+    lats = [p[0] for p in points]
+    lons = [p[1] for p in points]
+    clusters = summarize_clusters(lats, lons, cluster_points(lats, lons, radius_km), [p[2] for p in points])
+    for cluster in clusters:
+        cluster["location"] = f"{cluster['lat']:.4f}, {cluster['lon']:.4f}"
+    return clusters
 
 def extract_entities(osint_data):
     """
     Extrae entidades de los resultados OSINT para correlación
     """
+    entities, relationships, _ = _extract(osint_data)
+    return entities, relationships
+
+def _extract(osint_data):
+    # extract_entities más los clusters GPS de las imágenes (con su nº de fotos)
     entities = {
         "domains": set(),
         "ips": set(),
@@ -64,6 +90,20 @@ def extract_entities(osint_data):
                         entities["nameservers"].add(ns)
                         relationships.append((domain, ns, "nameserver"))
         
+        # Subdominios
+        elif module == "subdomains" and result.get("subdomains"):
+            domain = result.get("input")
+            if domain:
+                entities["domains"].add(domain)
+                
+                for hit in result["subdomains"]:
+                    sub = hit["name"]
+                    entities["domains"].add(sub)
+                    relationships.append((sub, domain, "subdomain_of"))
+                    for ip in hit.get("ips", []):
+                        entities["ips"].add(ip)
+                        relationships.append((sub, ip, "resolves_to"))
+        
         # Shodan
         elif module == "shodan_host" and result.get("result"):
             res = result["result"]
@@ -112,24 +152,90 @@ def extract_entities(osint_data):
                     entities["locations"].add(location)
                     relationships.append((phone, location, "registered_in"))
         
-        # EXIF
-        elif module == "exif_metadata" and result.get("results"):
-            for img in result["results"]:
-                if img.get("metadata", {}).get("gps"):
-                    gps = img["metadata"]["gps"]
-                    if gps.get("Latitude_Decimal") and gps.get("Longitude_Decimal"):
-                        location = f"{gps['Latitude_Decimal']:.4f}, {gps['Longitude_Decimal']:.4f}"
-                        entities["locations"].add(location)
+    # EXIF: una ubicación por grupo de fotos cercanas en vez de una por foto
+    clusters = gps_clusters(image_points(osint_data.get("results", [])))
+    for cluster in clusters:
+        entities["locations"].add(cluster["location"])
     
-    return entities, relationships
+    return entities, relationships, clusters
+
+
+class EntitySet:
+    """
+    Entidades, relaciones y clusters GPS de un resultado (o de un caso), extraídos
+    una sola vez y compartidos por el grafo, la exportación Maltego y el informe.
+    El grafo NetworkX se construye la primera vez que se pide.
+    """
+
+    def __init__(self, entities, relationships, clusters=(), graph=None, content_hash=None):
+        self.entities = entities
+        self.relationships = relationships
+        self.clusters = list(clusters)
+        self._graph = graph
+        # Hash del resultado de origen, para localizar sus artefactos ya generados
+        self.content_hash = content_hash
+
+    @classmethod
+    def from_result(cls, osint_data):
+        return cls(*_extract(osint_data), content_hash=osint_data.get("content_hash"))
+
+    @classmethod
+    def from_case(cls, case):
+        """Vista de un utils.case_graph.CaseGraph (usa su grafo ya indexado)"""
+        index = case.geo_index
+        clusters = gps_clusters(list(zip(index.lats.tolist(), index.lons.tolist(), index.items)))
+        return cls(case.entities(), case.relationships(), clusters, graph=case.graph)
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = _graph_from(self.entities, self.relationships, self.clusters)
+        return self._graph
+
+
+def _entity_set(data):
+    # Los consumidores aceptan un EntitySet ya extraído o el resultado OSINT original
+    return data if isinstance(data, EntitySet) else EntitySet.from_result(data)
+
+
+class EntitySetCache:
+    """LRU de EntitySet por id de resultado: correlar dos veces el mismo resultado no lo vuelve a recorrer"""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, result_id, load):
+        """
+        EntitySet de result_id; si no está memorizado se extrae de load() (que
+        devuelve el resultado OSINT o None). Devuelve None si el resultado no existe.
+        """
+        with self._lock:
+            entity_set = self._items.get(result_id)
+            if entity_set is not None:
+                self._items.move_to_end(result_id)
+                return entity_set
+        data = load()
+        if data is None:
+            return None
+        entity_set = EntitySet.from_result(data)
+        with self._lock:
+            self._items[result_id] = entity_set
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return entity_set
 
 
 def build_relationship_graph(osint_data):
     """
     Construye un grafo NetworkX con las relaciones encontradas
     """
-    entities, relationships = extract_entities(osint_data)
-    
+    es = _entity_set(osint_data)
+    return es.graph, es.entities, es.relationships
+
+
+def _graph_from(entities, relationships, clusters):
     G = nx.DiGraph()
     
     # Añadir nodos con tipos
@@ -137,85 +243,228 @@ def build_relationship_graph(osint_data):
         for entity in entity_set:
             G.add_node(entity, type=entity_type, label=str(entity)[:30])
     
+    # Nº de fotos de cada ubicación EXIF
+    for cluster in clusters:
+        G.nodes[cluster["location"]]["count"] = cluster["count"]
+    
     # Añadir aristas
     for source, target, rel_type in relationships:
         G.add_edge(source, target, relationship=rel_type)
     
-    return G, entities, relationships
+    return G
 
 
-def generate_graphviz_visualization(osint_data, output_path):
+def generate_graphviz_visualization(osint_data, output_path, render=True):
     """
     Genera visualización con matplotlib + networkx (sin dependencias binarias)
+
+    osint_data puede ser el resultado OSINT o un EntitySet ya extraído. Siempre se
+    escribe <output_path>.json con nodos, aristas y posiciones para dibujarlo en el
+    navegador; con render=False no se genera el PNG.
+    """
+    es = _entity_set(osint_data)
+    return _render_graph(es.graph, es.entities, output_path, render)
+
+
+# Tamaño del grafo (nodos) que decide cómo se dibuja
+SMALL_GRAPH = 60        # diseño original: spring_layout con etiquetas de nodos y relaciones
+MEDIUM_GRAPH = 400      # spring_layout con menos iteraciones, sin etiquetas de relaciones
+LABEL_MAX = 250         # por encima no se dibujan etiquetas de nodos
+DRAW_MAX = 5000         # por encima el PNG resume el grafo por tipos de entidad (el JSON sigue completo)
+# Hojas del mismo tipo colgando de un mismo nodo que se agrupan en un único nodo
+LEAF_GROUP_MIN = 4
+
+COLOR_MAP = {
+    "domains": "#90EE90",
+    "ips": "#FFB6C1",
+    "emails": "#ADD8E6",
+    "phones": "#FFD700",
+    "usernames": "#DDA0DD",
+    "organizations": "#FFA07A",
+    "locations": "#98FB98",
+    "nameservers": "#F0E68C"
+}
+
+TYPE_ORDER = ["usernames", "phones", "domains", "organizations", "emails", "nameservers", "ips", "locations"]
+
+
+def collapse_leaves(G, min_group=LEAF_GROUP_MIN):
+    """
+    Copia de G en la que las hojas (grado 1) del mismo tipo que cuelgan del mismo
+    nodo en el mismo sentido se sustituyen por un nodo "N <tipo>" cuando son al
+    menos min_group.
+    """
+    groups = defaultdict(list)
+    for node in G.nodes():
+        if G.degree(node) != 1:
+            continue
+        if G.out_degree(node):
+            parent, outgoing = next(iter(G.successors(node))), False
+        else:
+            parent, outgoing = next(iter(G.predecessors(node))), True
+        if G.degree(parent) > 1:
+            groups[(parent, G.nodes[node].get("type", "unknown"), outgoing)].append(node)
+
+    H = G.copy()
+    for (parent, node_type, outgoing), members in groups.items():
+        if len(members) < min_group:
+            continue
+        edges = [(parent, m) if outgoing else (m, parent) for m in members]
+        relationships = {G.edges[e].get("relationship") for e in edges}
+        H.remove_nodes_from(members)
+        # Con el sentido en el id, las hojas entrantes y salientes del mismo tipo son dos grupos
+        group = f"{parent} :: {node_type} ({'out' if outgoing else 'in'})"
+        H.add_node(group, type=node_type, label=f"{len(members)} {node_type}", collapsed=len(members))
+        edge = (parent, group) if outgoing else (group, parent)
+        H.add_edge(*edge, relationship="/".join(sorted(r for r in relationships if r)))
+    return H
+
+
+def summarize_by_type(G):
+    """Grafo de un nodo por tipo de entidad ("N domains") con las relaciones entre tipos agregadas"""
+    H = nx.DiGraph()
+    counts = defaultdict(int)
+    for _, data in G.nodes(data=True):
+        counts[data.get("type", "unknown")] += data.get("collapsed", 1)
+    for node_type, count in counts.items():
+        H.add_node(node_type, type=node_type, label=f"{count} {node_type}", collapsed=count)
+    edges = defaultdict(lambda: defaultdict(int))
+    for s, t, data in G.edges(data=True):
+        key = (G.nodes[s].get("type", "unknown"), G.nodes[t].get("type", "unknown"))
+        edges[key][data.get("relationship")] += 1
+    for (s, t), rels in edges.items():
+        H.add_edge(s, t, relationship=", ".join(f"{r} ({n})" for r, n in sorted(rels.items(), key=lambda x: -x[1])))
+    return H
+
+
+def layout_graph(G):
+    """
+    Posiciones de los nodos con un algoritmo acorde al tamaño del grafo:
+    spring_layout (Fruchterman-Reingold) hasta MEDIUM_GRAPH nodos y, por encima,
+    un layout por capas según el tipo de entidad, que es lineal en el nº de nodos.
+
+    Returns:
+        (dict nodo -> (x, y), nombre del layout)
     """
+    n = G.number_of_nodes()
+    if n <= SMALL_GRAPH:
+        return nx.spring_layout(G, k=2, iterations=50, seed=42), "spring"
+    if n <= MEDIUM_GRAPH:
+        return nx.spring_layout(G, iterations=max(15, 50 * SMALL_GRAPH // n), seed=42), "spring_fast"
+    layers = {t: i for i, t in enumerate(TYPE_ORDER)}
+    for node, data in G.nodes(data=True):
+        data["layer"] = layers.get(data.get("type"), len(TYPE_ORDER))
+    pos = nx.multipartite_layout(G, subset_key="layer")
+    for data in G.nodes.values():
+        del data["layer"]
+    return pos, "layered"
+
+
+def export_graph_json(G, pos, output_file, layout=None):
+    """Escribe nodos, aristas y posiciones en JSON para dibujar el grafo en el navegador"""
+    import json
+
+    nodes = []
+    for node, data in G.nodes(data=True):
+        x, y = pos[node]
+        item = {"id": str(node), "type": data.get("type", "unknown"), "label": data.get("label", str(node)[:30]),
+                "x": round(float(x), 4), "y": round(float(y), 4)}
+        for key in ("count", "collapsed"):
+            if key in data:
+                item[key] = data[key]
+        nodes.append(item)
+    edges = [{"source": str(s), "target": str(t), "relationship": data.get("relationship")}
+             for s, t, data in G.edges(data=True)]
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"layout": layout, "nodes": nodes, "edges": edges}, f, ensure_ascii=False)
+    return output_file
+
+
+def _render_graph(G, entities, output_path, render=True):
+    if G.number_of_nodes() == 0:
+        return {"error": "No hay suficientes datos para generar un grafo"}
+    
+    start = time.perf_counter()
+    view = collapse_leaves(G) if G.number_of_nodes() > SMALL_GRAPH else G
+    pos, layout = layout_graph(view)
+    out = {
+        "json_file": export_graph_json(view, pos, f"{output_path}.json", layout),
+        "layout": layout,
+        "nodes": G.number_of_nodes(),
+        "edges": G.number_of_edges(),
+        "drawn_nodes": view.number_of_nodes(),
+        "entities": {k: len(v) for k, v in entities.items() if v}
+    }
+    if render:
+        if view.number_of_nodes() > DRAW_MAX:
+            # Dibujar decenas de miles de nodos no cabe en un tiempo razonable ni se puede leer
+            summary = summarize_by_type(view)
+            out["graph_file"] = _draw_graph(summary, layout_graph(summary)[0], output_path)
+            out["png"] = "type_summary"
+        else:
+            out["graph_file"] = _draw_graph(view, pos, output_path)
+            out["png"] = "full"
+    out["render_seconds"] = round(time.perf_counter() - start, 3)
+    return out
+
+
+def _draw_graph(G, pos, output_path):
     import matplotlib
     matplotlib.use('Agg')  # Backend sin GUI
     import matplotlib.pyplot as plt
     
-    G, entities, relationships = build_relationship_graph(osint_data)
-    
-    if G.number_of_nodes() == 0:
-        return {"error": "No hay suficientes datos para generar un grafo"}
+    n = G.number_of_nodes()
+    small = n <= SMALL_GRAPH
     
     # Configurar figura
-    plt.figure(figsize=(16, 10))
-    
-    # Colores por tipo de entidad
-    color_map = {
-        "domains": "#90EE90",
-        "ips": "#FFB6C1",
-        "emails": "#ADD8E6",
-        "phones": "#FFD700",
-        "usernames": "#DDA0DD",
-        "organizations": "#FFA07A",
-        "locations": "#98FB98",
-        "nameservers": "#F0E68C"
-    }
+    plt.figure(figsize=(16, 10) if small else (20, 14))
     
     # Asignar colores a nodos
     node_colors = []
     for node in G.nodes():
         node_type = G.nodes[node].get('type', 'unknown')
-        node_colors.append(color_map.get(node_type, '#CCCCCC'))
-    
-    # Layout del grafo
-    pos = nx.spring_layout(G, k=2, iterations=50, seed=42)
+        node_colors.append(COLOR_MAP.get(node_type, '#CCCCCC'))
     
     # Dibujar nodos
     nx.draw_networkx_nodes(G, pos, 
                            node_color=node_colors,
-                           node_size=3000,
+                           node_size=3000 if small else max(20, 3000 * SMALL_GRAPH // n),
                            alpha=0.9,
                            edgecolors='black',
-                           linewidths=2)
+                           linewidths=2 if small else 0.5)
     
-    # Dibujar aristas
+    # Dibujar aristas (las flechas se dibujan una a una: solo en grafos medianos)
+    arrows = n <= MEDIUM_GRAPH
     nx.draw_networkx_edges(G, pos,
                            edge_color='gray',
-                           arrows=True,
-                           arrowsize=20,
-                           arrowstyle='->',
-                           width=2,
+                           arrows=arrows,
+                           arrowsize=20 if small else 8,
+                           **({"arrowstyle": '->'} if arrows else {}),
+                           width=2 if small else 0.5,
                            alpha=0.6)
     
     # Etiquetas de nodos
-    labels = {}
-    for node in G.nodes():
-        label = str(node)
-        if len(label) > 20:
-            label = label[:17] + "..."
-        labels[node] = label
-    
-    nx.draw_networkx_labels(G, pos, labels,
-                            font_size=9,
-                            font_weight='bold',
-                            font_family='sans-serif')
+    if n <= LABEL_MAX:
+        labels = {}
+        for node in G.nodes():
+            label = G.nodes[node].get("label", str(node)) if G.nodes[node].get("collapsed") else str(node)
+            if len(label) > 20:
+                label = label[:17] + "..."
+            if G.nodes[node].get("count", 1) > 1:
+                label += f"\n({G.nodes[node]['count']} fotos)"
+            labels[node] = label
+        
+        nx.draw_networkx_labels(G, pos, labels,
+                                font_size=9 if small else 6,
+                                font_weight='bold',
+                                font_family='sans-serif')
     
     # Etiquetas de aristas (relaciones)
-    edge_labels = nx.get_edge_attributes(G, 'relationship')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels,
-                                 font_size=7,
-                                 font_color='darkblue')
+    if small:
+        edge_labels = nx.get_edge_attributes(G, 'relationship')
+        nx.draw_networkx_edge_labels(G, pos, edge_labels,
+                                     font_size=7,
+                                     font_color='darkblue')
     
     # Título y leyenda
     plt.title("OSINT Correlation Graph", fontsize=20, fontweight='bold', pad=20)
@@ -223,14 +472,14 @@ def generate_graphviz_visualization(osint_data, output_path):
     # Crear leyenda
     from matplotlib.patches import Patch
     legend_elements = [
-        Patch(facecolor=color_map['domains'], label='Dominios'),
-        Patch(facecolor=color_map['ips'], label='IPs'),
-        Patch(facecolor=color_map['emails'], label='Emails'),
-        Patch(facecolor=color_map['phones'], label='Teléfonos'),
-        Patch(facecolor=color_map['usernames'], label='Usuarios'),
-        Patch(facecolor=color_map['organizations'], label='Organizaciones'),
-        Patch(facecolor=color_map['locations'], label='Ubicaciones'),
-        Patch(facecolor=color_map['nameservers'], label='Nameservers')
+        Patch(facecolor=COLOR_MAP['domains'], label='Dominios'),
+        Patch(facecolor=COLOR_MAP['ips'], label='IPs'),
+        Patch(facecolor=COLOR_MAP['emails'], label='Emails'),
+        Patch(facecolor=COLOR_MAP['phones'], label='Teléfonos'),
+        Patch(facecolor=COLOR_MAP['usernames'], label='Usuarios'),
+        Patch(facecolor=COLOR_MAP['organizations'], label='Organizaciones'),
+        Patch(facecolor=COLOR_MAP['locations'], label='Ubicaciones'),
+        Patch(facecolor=COLOR_MAP['nameservers'], label='Nameservers')
     ]
     plt.legend(handles=legend_elements, loc='upper left', fontsize=10)
     
@@ -239,25 +488,23 @@ def generate_graphviz_visualization(osint_data, output_path):
     
     # Guardar imagen
     output_file = f"{output_path}.png"
-    plt.savefig(output_file, dpi=150, bbox_inches='tight', facecolor='white')
+    plt.savefig(output_file, dpi=150 if small else 100, bbox_inches='tight', facecolor='white')
     plt.close()
     
-    return {
-        "graph_file": output_file,
-        "nodes": G.number_of_nodes(),
-        "edges": G.number_of_edges(),
-        "entities": {k: len(v) for k, v in entities.items() if v}
-    }
+    return output_file
 
 
 def export_to_maltego(osint_data, output_path):
     """
-    Exporta a formato CSV compatible con Maltego
+    Exporta a formato CSV compatible con Maltego (desde el resultado o un EntitySet)
     """
+    es = _entity_set(osint_data)
+    return _write_maltego(es.entities, es.relationships, output_path)
+
+
+def _write_maltego(entities, relationships, output_path):
     import csv
     
-    entities, relationships = extract_entities(osint_data)
-    
     # Archivo de entidades
     entities_file = f"{output_path}_entities.csv"
     with open(entities_file, 'w', newline='', encoding='utf-8') as f:
@@ -287,10 +534,13 @@ def export_to_maltego(osint_data, output_path):
 
 def generate_correlation_report(osint_data):
     """
-    Genera informe de correlaciones encontradas
+    Genera informe de correlaciones encontradas (desde el resultado o un EntitySet)
     """
-    entities, relationships = extract_entities(osint_data)
-    
+    es = _entity_set(osint_data)
+    return _build_report(es.entities, es.relationships, es.clusters)
+
+
+def _build_report(entities, relationships, clusters):
     report = {
         "summary": {
             "total_entities": sum(len(v) for v in entities.values()),
@@ -301,7 +551,8 @@ def generate_correlation_report(osint_data):
         "relationships": [
             {"source": s, "target": t, "type": r} 
             for s, t, r in relationships
-        ]
+        ],
+        "gps_clusters": clusters
     }
     
     # Detectar correlaciones interesantes
@@ -310,7 +561,7 @@ def generate_correlation_report(osint_data):
     # Mismo dominio en múltiples contextos
     domain_count = defaultdict(int)
     for s, t, r in relationships:
-        if s in entities["domains"]:
+        if s in entities.get("domains", ()):
             domain_count[s] += 1
     
     for domain, count in domain_count.items():
@@ -324,4 +575,20 @@ def generate_correlation_report(osint_data):
     
     report["correlations"] = correlations
     
-    return report
\ No newline at end of file
+    return report
+
+
+def correlate_case(case, output_path):
+    """
+    Grafo, exportación Maltego e informe de un caso completo (utils.case_graph.CaseGraph),
+    leyendo del grafo ya indexado del caso sin volver a procesar sus escaneos.
+    """
+    # Con el lock del caso: un escaneo que se añada a la vez no cambia el grafo a medio exportar
+    with case.lock:
+        es = EntitySet.from_case(case)
+        return {
+            "graph": generate_graphviz_visualization(es, f"{output_path}_graph"),
+            "maltego": export_to_maltego(es, f"{output_path}_maltego"),
+            "correlation_report": generate_correlation_report(es),
+            "case": case.stats()
+        }
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.asyncresolver
+import dns.resolver
+
+QTYPES = ["A", "AAAA", "MX", "NS", "TXT"]
+# DNS públicos (evita problemas con routers/ISP)
+NAMESERVERS = ["8.8.8.8", "1.1.1.1"]
+TIMEOUT = 5
+LIFETIME = 10
+CACHE_SIZE = 100000
+# Consultas simultáneas en resolve_many
+BULK_CONCURRENCY = 500
+
+
+def configure_resolver(resolver, nameservers=NAMESERVERS, timeout=TIMEOUT, lifetime=LIFETIME):
+    resolver.nameservers = list(nameservers)
+    resolver.timeout = timeout
+    resolver.lifetime = lifetime
+    return resolver
+
+
+def _remaining_ttl(answer):
+    # Las respuestas servidas desde la caché conservan su expiración original
+    return max(0, int(answer.expiration - time.time()))
+
+
+class DnsEngine:
+    """
+    Motor DNS compartido: un único resolver (síncrono y asyncio) con caché LRU
+    que respeta el TTL de cada respuesta, consultas de todos los tipos de
+    registro en paralelo y resolución masiva de listas de dominios.
+    """
+
+    def __init__(self, nameservers=NAMESERVERS, timeout=TIMEOUT, lifetime=LIFETIME,
+                 cache_size=CACHE_SIZE, max_workers=16):
+        self.cache = dns.resolver.LRUCache(cache_size)
+        self.resolver = configure_resolver(dns.resolver.Resolver(configure=False), nameservers, timeout, lifetime)
+        self.resolver.cache = self.cache
+        self.async_resolver = configure_resolver(dns.asyncresolver.Resolver(configure=False), nameservers, timeout, lifetime)
+        self.async_resolver.cache = self.cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dns")
+
+    def query(self, domain, qtype):
+        """Devuelve (lista de registros o {"error": ...}, ttl restante o None)"""
+        try:
+            answer = self.resolver.resolve(domain, qtype)
+            return [r.to_text() for r in answer], _remaining_ttl(answer)
+        except Exception as e:
+            return {"error": str(e)}, None
+
+    async def query_async(self, domain, qtype):
+        try:
+            answer = await self.async_resolver.resolve(domain, qtype)
+            return [r.to_text() for r in answer], _remaining_ttl(answer)
+        except Exception as e:
+            return {"error": str(e)}, None
+
+    def resolve_all(self, domain, qtypes=QTYPES):
+        """
+        Lanza todos los tipos de registro a la vez.
+
+        Returns:
+            (dict tipo -> registros/error, TTL mínimo de las respuestas o None)
+        """
+        futures = [(q, self._executor.submit(self.query, domain, q)) for q in qtypes]
+        return self._collect((q, *fut.result()) for q, fut in futures)
+
+    async def resolve_all_async(self, domain, qtypes=QTYPES):
+        answers = await asyncio.gather(*(self.query_async(domain, q) for q in qtypes))
+        return self._collect((q, *a) for q, a in zip(qtypes, answers))
+
+    @staticmethod
+    def _collect(answers):
+        records, ttls = {}, []
+        for q, value, ttl in answers:
+            records[q] = value
+            if ttl is not None:
+                ttls.append(ttl)
+        return records, (min(ttls) if ttls else None)
+
+    async def resolve_many_async(self, domains, qtypes=("A",), concurrency=BULK_CONCURRENCY, on_result=None,
+                                 limiter=None):
+        """
+        Resuelve un iterable de dominios con como mucho `concurrency` dominios en vuelo.
+
+        Args:
+            domains: iterable (se consume de forma perezosa)
+            on_result: callable(domain, records, min_ttl) llamado según termina cada dominio
+            limiter: utils.ratelimit.TokenBucket opcional (dominios por segundo)
+
+        Returns:
+            dict dominio -> records si on_result es None; si no, el nº de dominios resueltos
+        """
+        out = {} if on_result is None else None
+        pending = set()
+        count = 0
+
+        async def one(domain):
+            records, ttl = await self.resolve_all_async(domain, qtypes)
+            return domain, records, ttl
+
+        def deliver(done):
+            for fut in done:
+                domain, records, ttl = fut.result()
+                if on_result is None:
+                    out[domain] = records
+                else:
+                    on_result(domain, records, ttl)
+
+        for domain in domains:
+            if limiter is not None:
+                await limiter.acquire_async()
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                deliver(done)
+            pending.add(asyncio.ensure_future(one(domain)))
+            count += 1
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            deliver(done)
+        return out if on_result is None else count
+
+    def resolve_many(self, domains, qtypes=("A",), concurrency=BULK_CONCURRENCY, on_result=None, limiter=None):
+        """Versión bloqueante de resolve_many_async (no llamar desde un loop en marcha)"""
+        return asyncio.run(self.resolve_many_async(domains, qtypes, concurrency, on_result, limiter))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_dns_engine():
+    """Motor DNS compartido por todo el proceso"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = DnsEngine()
+    return _engine
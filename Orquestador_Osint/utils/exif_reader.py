@@ -0,0 +1,190 @@
+import mmap
+import os
+import struct
+
+# Lectura de EXIF/GPS directamente de las cabeceras JPEG (APP1) y TIFF (IFD) sobre
+# un mmap del fichero, sin decodificar la imagen. Devuelve los mismos valores que
+# Image._getexif() de Pillow para que los resultados no cambien.
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+# Tipo TIFF -> (tamaño en bytes, formato struct); 2 (ASCII), 1/7 (BYTE/UNDEFINED) y racionales aparte
+_TYPES = {
+    1: (1, None), 2: (1, None), 3: (2, "H"), 4: (4, "L"), 5: (8, "L"), 6: (1, "b"), 7: (1, None),
+    8: (2, "h"), 9: (4, "l"), 10: (8, "l"), 11: (4, "f"), 12: (8, "d"), 13: (4, "L"),
+}
+
+# Marcadores SOF con el tamaño de la imagen (excluye DHT, JPG y DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+
+def _rational_float(num, den):
+    return num / den if den else float("nan")
+
+
+class _TiffData:
+    """Acceso a una estructura TIFF (cabecera + IFDs) que empieza en base dentro de buf"""
+
+    def __init__(self, buf, base, end, rational):
+        self.buf = buf
+        self.base = base
+        self.end = end
+        self.rational = rational
+        order = bytes(buf[base:base + 2])
+        if order == b"II":
+            self.prefix = "<"
+        elif order == b"MM":
+            self.prefix = ">"
+        else:
+            raise ValueError("cabecera TIFF no válida")
+        magic, self.first_ifd = self.unpack("HL", 2)
+        if magic != 42:
+            raise ValueError("TIFF no soportado (BigTIFF u otro)")
+
+    def unpack(self, fmt, offset):
+        start = self.base + offset
+        size = struct.calcsize(self.prefix + fmt)
+        if start < self.base or start + size > self.end:
+            raise ValueError("offset fuera de los datos")
+        return struct.unpack_from(self.prefix + fmt, self.buf, start)
+
+    def read_ifd(self, offset):
+        """dict tag -> valor de un IFD, con los valores de un elemento desempaquetados"""
+        (count,) = self.unpack("H", offset)
+        tags = {}
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, typ, n = self.unpack("HHL", entry)
+            if typ not in _TYPES:
+                continue
+            unit, fmt = _TYPES[typ]
+            size = unit * n
+            if size == 0:
+                continue
+            data_at = entry + 8 if size <= 4 else self.unpack("L", entry + 8)[0]
+            start = self.base + data_at
+            if start + size > self.end:
+                # Datos truncados o corruptos: Pillow también descarta el tag
+                continue
+            tags[tag] = self._value(typ, fmt, n, bytes(self.buf[start:start + size]))
+        return tags
+
+    def _value(self, typ, fmt, n, data):
+        if typ == 2:
+            if data.endswith(b"\0"):
+                data = data[:-1]
+            return data.decode("latin-1", "replace")
+        if fmt is None:
+            return data
+        values = struct.unpack(f"{self.prefix}{n * 2 if typ in (5, 10) else n}{fmt}", data)
+        if typ in (5, 10):
+            values = tuple(self.rational(num, den) for num, den in zip(values[::2], values[1::2]))
+        return values[0] if len(values) == 1 else values
+
+    def merged_exif(self):
+        """Equivalente a Image.getexif()._get_merged_dict(): IFD0 + IFD Exif, GPS anidado"""
+        tags = self.read_ifd(self.first_ifd)
+        if isinstance(tags.get(EXIF_IFD), int):
+            try:
+                tags.update(self.read_ifd(tags[EXIF_IFD]))
+            except (ValueError, struct.error):
+                pass
+        if isinstance(tags.get(GPS_IFD), int):
+            try:
+                tags[GPS_IFD] = self.read_ifd(tags[GPS_IFD])
+            except (ValueError, struct.error):
+                tags[GPS_IFD] = {}
+        return tags
+
+
+def _read_jpeg(buf, rational):
+    pos, size = 2, len(buf)
+    exif, dims = None, None
+    while pos + 4 <= size:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # Fin de cabeceras: a partir de aquí solo hay datos de imagen
+            break
+        (length,) = struct.unpack_from(">H", buf, pos + 2)
+        seg, seg_end = pos + 4, pos + 2 + length
+        if marker == 0xE1 and exif is None and buf[seg:seg + 6] == b"Exif\0\0":
+            exif = (seg + 6, min(seg_end, size))
+        elif marker in _SOF_MARKERS and dims is None:
+            height, width, layers = struct.unpack_from(">HHB", buf, seg + 1)
+            dims = (width, height, _JPEG_MODES.get(layers))
+        pos = seg_end
+    if dims is None or dims[2] is None:
+        return None
+    tags = {}
+    if exif is not None:
+        try:
+            tags = _TiffData(buf, exif[0], exif[1], rational).merged_exif()
+        except (ValueError, struct.error):
+            return None
+    return {"format": "JPEG", "width": dims[0], "height": dims[1], "mode": dims[2], "exif": tags or None}
+
+
+def _tiff_mode(tags):
+    photometric = tags.get(262)
+    samples = tags.get(277, 1)
+    bps = tags.get(258, 1)
+    bps = bps if isinstance(bps, tuple) else (bps,) * samples
+    extra = tags.get(338, ())
+    extra = extra if isinstance(extra, tuple) else (extra,)
+    if tags.get(339, 1) != 1:
+        return None
+    if photometric in (0, 1) and samples == 1:
+        return {(1,): "1", (8,): "L"}.get(bps)
+    if photometric == 2 and bps == (8, 8, 8):
+        return "RGB"
+    if photometric == 2 and bps == (8, 8, 8, 8) and extra in ((1,), (2,)):
+        return "RGBA"
+    if photometric == 5 and bps == (8, 8, 8, 8) and not extra:
+        return "CMYK"
+    return None
+
+
+def _read_tiff(buf, rational):
+    tiff = _TiffData(buf, 0, len(buf), rational)
+    tags = tiff.merged_exif()
+    mode = _tiff_mode(tags)
+    if mode is None or 256 not in tags or 257 not in tags:
+        return None
+    return {"format": "TIFF", "width": tags[256], "height": tags[257], "mode": mode, "exif": tags}
+
+
+def read_header_metadata(path, rational=_rational_float):
+    """
+    Lee formato, tamaño, modo y EXIF (con GPS) de un JPEG o TIFF sin decodificar la imagen.
+
+    Args:
+        path: ruta del fichero
+        rational: callable(numerador, denominador) para los valores racionales
+                  (p.ej. PIL.TiffImagePlugin.IFDRational para obtener lo mismo que Pillow)
+
+    Returns:
+        dict con format, width, height, mode y exif (dict tag -> valor o None),
+        o None si el formato no está soportado y hay que recurrir a Pillow
+    """
+    if os.path.getsize(path) < 8:
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        head = buf[:4]
+        try:
+            if head[:2] == b"\xff\xd8":
+                return _read_jpeg(buf, rational)
+            if head in (b"II*\0", b"MM\0*"):
+                return _read_tiff(buf, rational)
+        except (ValueError, struct.error):
+            return None
+    return None
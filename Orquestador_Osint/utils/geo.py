@@ -0,0 +1,165 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Distancia máxima entre dos fotos para que caigan en la misma ubicación
+CLUSTER_RADIUS_KM = 0.25
+KM_PER_DEG_LAT = np.pi * EARTH_RADIUS_KM / 180
+# Máximo de distancias calculadas de una vez al comparar dos celdas
+_PAIR_BLOCK = 1_000_000
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Distancia en km de (lat, lon) a cada punto de los arrays lats/lons"""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _pairwise_within(lats_a, lons_a, lats_b, lons_b, radius_km):
+    """True si algún punto de A está a radius_km o menos de alguno de B"""
+    step = max(1, _PAIR_BLOCK // max(1, len(lats_b)))
+    for i in range(0, len(lats_a), step):
+        d = haversine_km(lats_a[i:i + step, None], lons_a[i:i + step, None], lats_b[None, :], lons_b[None, :])
+        if (d <= radius_km).any():
+            return True
+    return False
+
+
+def _chord_km(radius_km):
+    # Cuerda (distancia en línea recta) equivalente a radius_km sobre la esfera
+    return 2 * EARTH_RADIUS_KM * np.sin(min(radius_km, np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+
+
+def _grid_cells(lats, lons, cell_km):
+    # Coordenadas cartesianas en km: la distancia euclídea es la cuerda, que crece con la
+    # distancia sobre la esfera, sin la deformación de una proyección (polos, antimeridiano)
+    lat, lon = np.radians(lats), np.radians(lons)
+    xyz = EARTH_RADIUS_KM * np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1)
+    return np.floor(xyz / cell_km).astype(np.int64)
+
+
+def cluster_points(lats, lons, radius_km=CLUSTER_RADIUS_KM):
+    """
+    Agrupa coordenadas por cercanía (estilo DBSCAN con min_samples=1): dos puntos a
+    radius_km o menos acaban en el mismo cluster, también de forma encadenada.
+
+    Los puntos (en coordenadas cartesianas) se reparten en una rejilla de cubos de
+    lado cuerda(radius_km)/√3, de modo que todos los puntos de un cubo están ya a
+    menos de radius_km entre sí; solo se calculan distancias entre cubos vecinos.
+
+    Returns:
+        array de etiquetas 0..k-1, una por punto
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if len(lats) == 0:
+        return np.zeros(0, dtype=np.int64)
+    cell_km = _chord_km(radius_km) / np.sqrt(3) * 0.999
+    cells, cell_of = np.unique(_grid_cells(lats, lons, cell_km), axis=0, return_inverse=True)
+    cell_of = cell_of.reshape(-1)
+    members = np.split(np.argsort(cell_of, kind="stable"), np.cumsum(np.bincount(cell_of))[:-1])
+    index = {tuple(c): i for i, c in enumerate(cells.tolist())}
+
+    parent = list(range(len(cells)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Cubos a los que puede llegar un punto a radius_km (cuerda < √3·lado ⇒ hasta 2 por eje)
+    offsets = [(dx, dy, dz) for dx in range(-2, 3) for dy in range(-2, 3) for dz in range(-2, 3)
+               if (dx, dy, dz) > (0, 0, 0)]
+    for i, (x, y, z) in enumerate(cells.tolist()):
+        a = members[i]
+        for dx, dy, dz in offsets:
+            j = index.get((x + dx, y + dy, z + dz))
+            if j is None or find(i) == find(j):
+                continue
+            b = members[j]
+            if _pairwise_within(lats[a], lons[a], lats[b], lons[b], radius_km):
+                parent[find(j)] = find(i)
+
+    roots = np.array([find(i) for i in range(len(cells))])
+    _, labels = np.unique(roots[cell_of], return_inverse=True)
+    return labels.reshape(-1)
+
+
+def summarize_clusters(lats, lons, labels, items=None):
+    """
+    Un dict por cluster con su centroide, nº de puntos, radio y elementos,
+    ordenados de mayor a menor nº de puntos.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    clusters = []
+    for label in range(int(labels.max()) + 1 if len(labels) else 0):
+        idx = np.nonzero(labels == label)[0]
+        lat, lon = float(lats[idx].mean()), float(lons[idx].mean())
+        clusters.append({
+            "lat": round(lat, 6),
+            "lon": round(lon, 6),
+            "count": int(len(idx)),
+            "radius_km": round(float(haversine_km(lat, lon, lats[idx], lons[idx]).max()), 3),
+            "members": [items[i] for i in idx] if items is not None else idx.tolist(),
+        })
+    clusters.sort(key=lambda c: -c["count"])
+    return clusters
+
+
+def image_points(results):
+    """
+    (lat, lon, fichero) de cada imagen con GPS en una lista de resultados de módulos
+    (los "results" de un escaneo o de varios).
+    """
+    points = []
+    for result in results:
+        if result.get("module") != "exif_metadata":
+            continue
+        for img in result.get("results") or []:
+            gps = (img.get("metadata") or {}).get("gps") or {}
+            lat, lon = gps.get("Latitude_Decimal"), gps.get("Longitude_Decimal")
+            if lat is None or lon is None:
+                continue
+            try:
+                lat, lon = float(lat), float(lon)
+            except (TypeError, ValueError):
+                continue
+            if np.isfinite(lat) and np.isfinite(lon):
+                points.append((lat, lon, img.get("name") or img.get("file")))
+    return points
+
+
+class GeoIndex:
+    """
+    Índice espacial de puntos para consultas por radio: los puntos se ordenan por
+    latitud y cada consulta solo calcula distancias dentro de la franja de latitudes
+    que puede estar a r_km.
+    """
+
+    def __init__(self, points=()):
+        points = sorted(points, key=lambda p: p[0])
+        self.lats = np.array([p[0] for p in points], dtype=float)
+        self.lons = np.array([p[1] for p in points], dtype=float)
+        self.items = [p[2] for p in points]
+
+    def __len__(self):
+        return len(self.items)
+
+    def within(self, lat, lon, r_km):
+        """Lista de (elemento, distancia en km) a r_km o menos de (lat, lon), de más cerca a más lejos"""
+        band = r_km / KM_PER_DEG_LAT
+        lo = int(np.searchsorted(self.lats, lat - band, side="left"))
+        hi = int(np.searchsorted(self.lats, lat + band, side="right"))
+        if lo >= hi:
+            return []
+        d = haversine_km(lat, lon, self.lats[lo:hi], self.lons[lo:hi])
+        hits = np.nonzero(d <= r_km)[0]
+        hits = hits[np.argsort(d[hits], kind="stable")]
+        return [(self.items[lo + i], round(float(d[i]), 3)) for i in hits]
+
+    def clusters(self, radius_km=CLUSTER_RADIUS_KM):
+        labels = cluster_points(self.lats, self.lons, radius_km)
+        return summarize_clusters(self.lats, self.lons, labels, self.items)
@@ -1,24 +1,206 @@
 from datetime import datetime, timezone
+import json
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
 
 DEFAULT_TIMEOUT = 8
 USER_AGENT = "osint_lab/0.1 (+https://example.local/lab)"
 
+# Sesión HTTP compartida: nº de hosts con pool propio, conexiones keep-alive por host y reintentos
+POOL_CONNECTIONS = 64
+POOL_MAXSIZE = 16
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
 def pretty_now():
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
-def safe_request_head(url, timeout=DEFAULT_TIMEOUT):
-    headers = {"User-Agent": USER_AGENT}
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0}
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+class _CountingHTTPPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count("new_connections")
+        return super()._new_conn()
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter que cuenta peticiones y conexiones TCP/TLS nuevas"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CountingHTTPPool, "https": _CountingHTTPSPool}
+
+    def send(self, request, **kwargs):
+        _count("requests")
+        return super().send(request, **kwargs)
+
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session(pool_connections, pool_maxsize, retries, backoff_factor):
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries,
+                  backoff_factor=backoff_factor, status_forcelist=RETRY_STATUS,
+                  allowed_methods=frozenset({"GET", "HEAD"}),
+                  respect_retry_after_header=True, raise_on_status=False)
+    adapter = _PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                             max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def new_session(pool_maxsize=POOL_MAXSIZE, retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF):
+    """Sesión independiente de la compartida, para clientes de API con sus propios reintentos y límites"""
+    return _build_session(1, pool_maxsize, retries, backoff_factor)
+
+def configure_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                      retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF):
+    """
+    (Re)crea la sesión compartida por todos los módulos.
+
+    Args:
+        pool_connections: nº de hosts distintos cuyo pool se mantiene abierto
+        pool_maxsize: conexiones keep-alive por host
+        retries: reintentos ante errores de conexión y respuestas 429/5xx
+        backoff_factor: espera exponencial entre reintentos (respeta Retry-After)
+    """
+    global _session
+    session = _build_session(pool_connections, pool_maxsize, retries, backoff_factor)
+    with _session_lock:
+        old, _session = _session, session
+    if old is not None:
+        old.close()
+    return session
+
+def get_session():
+    """Devuelve la sesión compartida (pool de conexiones con keep-alive), creándola si hace falta"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE, RETRY_TOTAL, RETRY_BACKOFF)
+    return _session
+
+def session_stats():
+    """Contadores de reutilización de conexiones de la sesión compartida"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["reused_connections"] = max(0, stats["requests"] - stats["new_connections"])
+    stats["reuse_ratio"] = round(stats["reused_connections"] / stats["requests"], 3) if stats["requests"] else 0.0
+    return stats
+
+def safe_request_head(url, timeout=DEFAULT_TIMEOUT, allow_redirects=True):
     try:
-        r = requests.head(url, headers=headers, allow_redirects=True, timeout=timeout)
+        r = get_session().head(url, allow_redirects=allow_redirects, timeout=timeout)
         return {"status_code": r.status_code, "url": r.url, "ok": r.ok, "headers": dict(r.headers)}
     except requests.RequestException as e:
         return {"error": str(e)}
 
-def safe_request_get(url, timeout=DEFAULT_TIMEOUT):
-    headers = {"User-Agent": USER_AGENT}
+def safe_request_get(url, timeout=DEFAULT_TIMEOUT, params=None, allow_redirects=True):
     try:
-        r = requests.get(url, headers=headers, allow_redirects=True, timeout=timeout)
+        r = get_session().get(url, params=params, allow_redirects=allow_redirects, timeout=timeout)
         return {"status_code": r.status_code, "url": r.url, "ok": r.ok, "text": r.text, "headers": dict(r.headers)}
     except requests.RequestException as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+STREAM_CHUNK = 8192
+
+def stream_request_get(url, timeout=DEFAULT_TIMEOUT, max_bytes=65536, on_chunk=None, headers=None,
+                       allow_redirects=True, verify=True):
+    """
+    GET que lee el cuerpo por trozos y se detiene al llegar a max_bytes o cuando
+    on_chunk(chunk) devuelve True, sin descargar el resto de la respuesta.
+
+    Returns:
+        dict como safe_request_get más "bytes_read" y "truncated"
+    """
+    try:
+        r = get_session().get(url, headers=headers, allow_redirects=allow_redirects, timeout=timeout,
+                              verify=verify, stream=True)
+    except requests.RequestException as e:
+        return {"error": str(e)}
+    buf = bytearray()
+    truncated = False
+    try:
+        for chunk in r.iter_content(STREAM_CHUNK):
+            buf += chunk
+            if len(buf) >= max_bytes or (on_chunk and on_chunk(chunk)):
+                truncated = True
+                break
+    except requests.RequestException as e:
+        return {"error": str(e)}
+    finally:
+        r.close()
+    text = bytes(buf[:max_bytes]).decode(r.encoding or "utf-8", errors="replace")
+    return {"status_code": r.status_code, "url": r.url, "ok": r.ok, "headers": dict(r.headers),
+            "text": text, "bytes_read": len(buf), "truncated": truncated}
+
+class JsonlWriter:
+    """
+    Escribe un objeto JSON por línea y vuelca el buffer cada flush_every
+    líneas o cada flush_interval segundos, para poder hacer tail del fichero
+    mientras el análisis sigue en marcha. Un hilo en segundo plano vuelca también
+    cuando no llegan más líneas (p.ej. esperando a un módulo lento); close() lo para.
+    Se puede llamar desde varios hilos.
+    """
+
+    def __init__(self, fp, flush_every=20, flush_interval=1.0):
+        self.fp = fp
+        self._lock = threading.Lock()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.lines = 0
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_idle, name="jsonl-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_idle(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if self._unflushed and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+
+    def write(self, obj):
+        line = json.dumps(obj, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.fp.write(line)
+            self.lines += 1
+            self._unflushed += 1
+            now = time.monotonic()
+            if self._unflushed >= self.flush_every or now - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Para el hilo de volcado y vuelca lo pendiente (no cierra fp)"""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def _flush_locked(self):
+        self.fp.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
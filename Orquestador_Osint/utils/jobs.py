@@ -0,0 +1,124 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_TTL = 3600
+MAX_JOBS = 1000
+
+
+class Job:
+    """Trabajo en segundo plano con una lista de eventos de progreso consultable"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self.result = None
+        self.error = None
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "error")
+
+    def emit(self, event, data):
+        """Añade un evento de progreso y despierta a los clientes SSE en espera"""
+        with self._cond:
+            self.events.append({"seq": len(self.events) + 1, "event": event, "data": data})
+            self._cond.notify_all()
+
+    def _set_status(self, status, result=None, error=None):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            if self.done:
+                self.finished = time.time()
+            self._cond.notify_all()
+
+    def wait_events(self, after=0, timeout=15):
+        """Bloquea hasta que haya eventos con seq > after o el trabajo termine"""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > after or self.done, timeout=timeout)
+            return self.events[after:], self.done
+
+    def to_dict(self, after=0):
+        with self._cond:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "events": self.events[after:],
+                "last_seq": len(self.events),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobManager:
+    """
+    Ejecuta trabajos en un pool de hilos propio y los conserva JOB_TTL segundos
+    tras terminar (como mucho MAX_JOBS a la vez).
+    """
+
+    def __init__(self, max_workers=4, ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="osint-job")
+        self._jobs = OrderedDict()
+        # key de submit_once -> id del último trabajo lanzado con ella
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """Lanza fn(job, *args, **kwargs); su valor de retorno pasa a job.result"""
+        job = Job(kind)
+        with self._lock:
+            self._purge_locked()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def submit_once(self, key, kind, fn, *args, **kwargs):
+        """
+        Como submit, pero si ya hay un trabajo sin terminar con la misma key se
+        devuelve ese en lugar de lanzar otro: peticiones simultáneas lo comparten.
+        """
+        with self._lock:
+            job = self._jobs.get(self._keys.get(key))
+            if job is not None and not job.done:
+                return job
+            self._purge_locked()
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._keys[key] = job.id
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job._set_status("running")
+        try:
+            job._set_status("done", result=fn(job, *args, **kwargs))
+        except Exception as e:
+            job._set_status("error", error=str(e))
+
+    def _purge_locked(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.done and now - j.finished > self.ttl]:
+            del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            oldest = next((j.id for j in self._jobs.values() if j.done), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+        if len(self._keys) > len(self._jobs):
+            self._keys = {k: job_id for k, job_id in self._keys.items() if job_id in self._jobs}
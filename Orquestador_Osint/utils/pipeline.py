@@ -0,0 +1,434 @@
+import asyncio
+import ipaddress
+import json
+import re
+import sys
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from modules.whois_module import module_whois, module_whois_async
+from modules.dns_module import module_dns, module_dns_async
+from modules.http_meta_module import module_http_meta, module_http_meta_async
+from modules.username_check_module import load_sites, module_username_check, module_username_check_async
+from modules.phone_module import module_phone_lookup, module_phone_lookup_async
+from modules.shodan_module import module_shodan_host, module_shodan_host_async
+from modules.subdomain_module import module_subdomains, module_subdomains_async
+from utils.async_http import AsyncHttpClient, MAX_INFLIGHT, PER_HOST_LIMIT
+from utils.dns_engine import get_dns_engine
+from utils.helpers import pretty_now
+
+MAX_WORKERS = 6
+# Tareas enviadas al pool por cada worker antes de esperar a que alguna termine
+QUEUE_FACTOR = 2
+# Dominios resolviéndose a la vez en el motor async
+DNS_INFLIGHT = 500
+
+TARGET_TYPES = ("domain", "username", "phone", "ip")
+PHONE_RE = re.compile(r"^\+?[\d\s().-]{6,}$")
+DOMAIN_RE = re.compile(r"^(?:https?://)?([a-z0-9-]+\.)+[a-z]{2,}/?$", re.IGNORECASE)
+
+
+def guess_target_type(value):
+    """
+    Deduce el tipo de un objetivo escrito en texto plano: IP, teléfono, dominio
+    (algo.tld) y, si no encaja nada, usuario. Un usuario con punto (john.doe) se
+    toma por dominio; para esos se usa JSONL con "type" o --targets-type.
+    """
+    try:
+        ipaddress.ip_address(value)
+        return "ip"
+    except ValueError:
+        pass
+    if PHONE_RE.match(value):
+        return "phone"
+    if DOMAIN_RE.match(value):
+        return "domain"
+    return "username"
+
+
+def warn_invalid_target(message):
+    # A stderr: con --out-format jsonl sin --out, stdout es la salida de resultados
+    print(f"aviso: {message} (línea ignorada)", file=sys.stderr)
+
+
+def load_targets(path, default_type=None, on_invalid=warn_invalid_target):
+    """
+    Lee un fichero de objetivos de forma perezosa.
+
+    Cada línea puede ser un objetivo en texto plano (el tipo se deduce, o es
+    default_type si se indica) o un objeto JSON con campo "type", p.ej.
+    {"type": "domain", "value": "example.com"}. Las líneas vacías y las que
+    empiezan por '#' se ignoran.
+
+    Una línea inválida no detiene el lote: se pasa "ruta:línea: motivo" a
+    on_invalid y se continúa con la siguiente.
+
+    Yields:
+        tuplas (tipo, valor)
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    obj = json.loads(line)
+                except json.JSONDecodeError as e:
+                    on_invalid(f"{path}:{lineno}: JSON inválido ({e})")
+                    continue
+                ty = obj.get("type") if isinstance(obj, dict) else None
+                value = (obj.get("value") or obj.get(ty)) if ty else None
+                if ty not in TARGET_TYPES or not value:
+                    on_invalid(f"{path}:{lineno}: se requiere 'type' en {TARGET_TYPES} y 'value'")
+                    continue
+                yield ty, str(value).strip()
+            else:
+                yield default_type or guess_target_type(line), line
+
+
+def build_tasks(target_type, value, options):
+    """
+    Devuelve los pares (objetivo, módulo) a ejecutar para un objetivo.
+
+    Args:
+        target_type: uno de TARGET_TYPES
+        value: valor del objetivo
+        options: namespace/objeto con summary, compact, numverify_key y shodan_key
+
+    Returns:
+        lista de tuplas (target, module_name, fn, args, kwargs)
+    """
+    summary = getattr(options, "summary", False)
+    target = {"type": target_type, "value": value}
+    if target_type == "domain":
+        tasks = [
+            (target, "whois", module_whois, (value, summary), {}),
+            (target, "dns", module_dns, (value, summary), {}),
+            (target, "http_meta", module_http_meta, (value, summary),
+             {"deadline": getattr(options, "http_deadline", None)}),
+        ]
+        if getattr(options, "subdomains", False):
+            tasks.append((target, "subdomains", module_subdomains, (value,), _subdomain_kwargs(options)))
+    elif target_type == "username":
+        compact = getattr(options, "compact", False) or summary
+        sites = load_sites(options.sites_file) if getattr(options, "sites_file", None) else None
+        tasks = [(target, "username_check", module_username_check, (value,), {"sites": sites, "compact": compact})]
+    elif target_type == "phone":
+        tasks = [(target, "phone_lookup", module_phone_lookup, (value, getattr(options, "numverify_key", None)), {})]
+    elif target_type == "ip":
+        tasks = [(target, "shodan_host", module_shodan_host, (value,), {"api_key": getattr(options, "shodan_key", None)})]
+    else:
+        raise ValueError(f"tipo de objetivo desconocido: {target_type}")
+    
+    cache = getattr(options, "cache", None)
+    if cache is None:
+        return tasks
+    refresh = getattr(options, "refresh", False)
+    return [(target, name, partial(cache.call, name, value, fn, options=cache_options(name, options), refresh=refresh),
+             args, kwargs) for target, name, fn, args, kwargs in tasks]
+
+
+def _subdomain_kwargs(options):
+    return {"wordlist": getattr(options, "wordlist", None), "rate": getattr(options, "dns_rate", None),
+            "on_hit": getattr(options, "on_subdomain_hit", None)}
+
+
+def cache_options(module_name, options):
+    """Opciones que cambian el resultado de un módulo y por tanto forman parte de la clave de caché"""
+    summary = getattr(options, "summary", False)
+    if module_name == "whois":
+        return {"summary": summary}
+    if module_name == "username_check":
+        return {"compact": getattr(options, "compact", False) or summary, "sites_file": getattr(options, "sites_file", None)}
+    if module_name == "subdomains":
+        return {"wordlist": getattr(options, "wordlist", None)}
+    return None
+
+
+def iter_tasks(targets, options):
+    """Expande un iterable de (tipo, valor) en tareas sin materializar la lista completa"""
+    for target_type, value in targets:
+        for task in build_tasks(target_type, value, options):
+            yield task
+
+
+def _run_task(task):
+    target, module_name, fn, args, kwargs = task
+    try:
+        return target, fn(*args, **kwargs)
+    except Exception as e:
+        return target, {"module": module_name, "input": target["value"], "module_error": str(e)}
+
+
+def run_tasks(tasks, on_result, max_workers=MAX_WORKERS):
+    """
+    Ejecuta todas las tareas sobre un único ThreadPoolExecutor acotado.
+
+    Nunca hay más de max_workers * QUEUE_FACTOR tareas pendientes, de modo que
+    un generador con miles de objetivos no se materializa en memoria. on_result
+    se llama siempre desde el hilo que invoca run_tasks, en orden de finalización.
+
+    Args:
+        tasks: iterable de tareas (ver build_tasks)
+        on_result: callable(target, result)
+        max_workers: tamaño del pool para todo el lote
+
+    Returns:
+        número de tareas ejecutadas
+    """
+    max_workers = max(1, max_workers)
+    limit = max_workers * QUEUE_FACTOR
+    pending = set()
+    count = 0
+
+    def drain(return_when):
+        nonlocal pending
+        done, pending = wait(pending, return_when=return_when)
+        for fut in done:
+            on_result(*fut.result())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for task in tasks:
+            if len(pending) >= limit:
+                drain(FIRST_COMPLETED)
+            pending.add(ex.submit(_run_task, task))
+            count += 1
+        while pending:
+            drain(FIRST_COMPLETED)
+    return count
+
+
+def _timed(fn, args, kwargs):
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception as e:
+        result = {"module_error": str(e)}
+    return result, time.perf_counter() - start
+
+
+def _finish(name, value, result, elapsed):
+    result.setdefault("module", name)
+    result.setdefault("input", value)
+    failed = "error" in result or "module_error" in result
+    return result, {"seconds": round(elapsed, 3), "status": "error" if failed else "ok"}
+
+
+class _Task:
+    __slots__ = ("running", "done", "skip", "released")
+
+    def __init__(self):
+        self.running = self.done = self.skip = self.released = False
+
+
+class DeadlineExecutor:
+    """
+    Pool para trabajo con plazo (run_with_deadline). Como mucho max_workers tareas
+    ocupan plaza a la vez. Una tarea abandonada por timeout no se puede interrumpir
+    (whois o DNS siguen hasta su propio timeout), pero deja su plaza libre para los
+    escaneos siguientes. Como mucho max_abandoned siguen así a la vez; por encima,
+    lo abandonado conserva su plaza hasta terminar, y el nº de hilos nunca pasa de
+    max_workers + max_abandoned.
+    """
+
+    def __init__(self, max_workers, max_abandoned=None):
+        self.max_workers = max_workers
+        self.max_abandoned = max_workers if max_abandoned is None else max_abandoned
+        self._pool = ThreadPoolExecutor(max_workers=max_workers + self.max_abandoned, thread_name_prefix="deadline")
+        self._slots = threading.Semaphore(max_workers)
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self.abandoned = 0
+
+    def submit(self, fn, *args, **kwargs):
+        task = _Task()
+
+        def run():
+            self._slots.acquire()
+            with self._lock:
+                if task.skip:
+                    # Abandonada mientras esperaba plaza: no llega a ejecutarse
+                    self._slots.release()
+                    return None
+                task.running = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    task.done = True
+                    if task.released:
+                        self.abandoned -= 1
+                    else:
+                        self._slots.release()
+
+        fut = self._pool.submit(run)
+        with self._lock:
+            self._tasks[fut] = task
+        fut.add_done_callback(self._forget)
+        return fut
+
+    def _forget(self, fut):
+        with self._lock:
+            self._tasks.pop(fut, None)
+
+    def abandon(self, fut):
+        """Nadie espera ya a fut: se cancela si no ha empezado y, si no, deja de ocupar plaza"""
+        if fut.cancel():
+            return
+        with self._lock:
+            task = self._tasks.get(fut)
+            if task is None or task.done or task.released:
+                return
+            if not task.running:
+                task.skip = True
+            elif self.abandoned < self.max_abandoned:
+                task.released = True
+                self.abandoned += 1
+                self._slots.release()
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def run_with_deadline(executor, calls, deadline, on_result=None):
+    """
+    Lanza varios módulos a la vez en executor y espera como mucho deadline segundos.
+
+    Los módulos que no terminan a tiempo se sustituyen por un resultado de error.
+    No se pueden interrumpir: siguen hasta acabar (o hasta su propio timeout) y su
+    resultado se descarta. Con un DeadlineExecutor dejan de ocupar plaza en cuanto
+    se abandonan; con un ThreadPoolExecutor solo se cancelan los que no han empezado
+    y el resto sigue ocupando su hilo.
+
+    Args:
+        executor: DeadlineExecutor (o ThreadPoolExecutor) compartido
+        calls: lista de tuplas (module_name, input, fn, args, kwargs)
+        deadline: segundos para el conjunto de módulos
+        on_result: callable(result) opcional, llamado según termina cada módulo
+
+    Returns:
+        (resultados en el orden de calls, {module_name: {"seconds", "status"}})
+    """
+    futures = {executor.submit(_timed, fn, args, kwargs): i for i, (_, _, fn, args, kwargs) in enumerate(calls)}
+    results, timings = [None] * len(calls), {}
+    try:
+        for fut in as_completed(futures, timeout=deadline):
+            i = futures[fut]
+            name, value = calls[i][0], calls[i][1]
+            results[i], timings[name] = _finish(name, value, *fut.result())
+            if on_result:
+                on_result(results[i])
+    except FuturesTimeout:
+        pass
+    abandon = getattr(executor, "abandon", None) or (lambda f: f.cancel())
+    for fut, i in futures.items():
+        if results[i] is None:
+            abandon(fut)
+            name, value = calls[i][0], calls[i][1]
+            results[i] = {"module": name, "input": value, "ts": pretty_now(),
+                          "error": f"timeout: el módulo no terminó en {deadline}s"}
+            timings[name] = {"seconds": deadline, "status": "timeout"}
+            if on_result:
+                on_result(results[i])
+    return results, timings
+
+
+class AsyncEngine:
+    """Recursos compartidos por todas las tareas async de un lote"""
+
+    def __init__(self, max_inflight=MAX_INFLIGHT, per_host=PER_HOST_LIMIT, dns_inflight=DNS_INFLIGHT):
+        self.client = AsyncHttpClient(limit=max_inflight, per_host=per_host)
+        self.dns_engine = get_dns_engine()
+        self.dns_slots = asyncio.Semaphore(dns_inflight)
+
+    async def __aenter__(self):
+        await self.client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.__aexit__(*exc)
+
+    async def dns(self, domain, summary):
+        async with self.dns_slots:
+            return await module_dns_async(domain, summary, engine=self.dns_engine)
+
+
+def build_async_tasks(target_type, value, options, engine):
+    """
+    Equivalente async de build_tasks.
+
+    Returns:
+        lista de tuplas (target, module_name, factoría sin argumentos que crea la corrutina)
+    """
+    summary = getattr(options, "summary", False)
+    target = {"type": target_type, "value": value}
+    client = engine.client
+    if target_type == "domain":
+        deadline = getattr(options, "http_deadline", None)
+        tasks = [
+            (target, "whois", lambda: module_whois_async(value, summary)),
+            (target, "dns", lambda: engine.dns(value, summary)),
+            (target, "http_meta", lambda: module_http_meta_async(value, summary, client=client, deadline=deadline)),
+        ]
+        if getattr(options, "subdomains", False):
+            kwargs = _subdomain_kwargs(options)
+            tasks.append((target, "subdomains", lambda: module_subdomains_async(value, engine=engine.dns_engine, **kwargs)))
+    elif target_type == "username":
+        compact = getattr(options, "compact", False) or summary
+        sites = load_sites(options.sites_file) if getattr(options, "sites_file", None) else None
+        tasks = [(target, "username_check", lambda: module_username_check_async(value, sites, compact=compact, client=client))]
+    elif target_type == "phone":
+        key = getattr(options, "numverify_key", None)
+        tasks = [(target, "phone_lookup", lambda: module_phone_lookup_async(value, key, client=client))]
+    elif target_type == "ip":
+        key = getattr(options, "shodan_key", None)
+        tasks = [(target, "shodan_host", lambda: module_shodan_host_async(value, api_key=key, client=client))]
+    else:
+        raise ValueError(f"tipo de objetivo desconocido: {target_type}")
+    
+    cache = getattr(options, "cache", None)
+    if cache is None:
+        return tasks
+    refresh = getattr(options, "refresh", False)
+    return [(target, name, partial(cache.call_async, name, value, factory, cache_options(name, options), refresh))
+            for target, name, factory in tasks]
+
+
+async def _run_async_task(task):
+    target, module_name, factory = task
+    try:
+        return target, await factory()
+    except Exception as e:
+        return target, {"module": module_name, "input": target["value"], "module_error": str(e)}
+
+
+async def run_tasks_async(tasks, on_result, max_inflight=MAX_INFLIGHT):
+    """
+    Equivalente asyncio de run_tasks: mantiene hasta max_inflight tareas en vuelo
+    y consume el iterable de forma perezosa. on_result se llama en el hilo del loop.
+
+    Returns:
+        número de tareas ejecutadas
+    """
+    max_inflight = max(1, max_inflight)
+    pending = set()
+    count = 0
+
+    async def drain():
+        nonlocal pending
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for fut in done:
+            on_result(*fut.result())
+
+    for task in tasks:
+        if len(pending) >= max_inflight:
+            await drain()
+        pending.add(asyncio.ensure_future(_run_async_task(task)))
+        count += 1
+    while pending:
+        await drain()
+    return count
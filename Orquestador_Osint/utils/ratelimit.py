@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador token bucket seguro entre hilos y utilizable desde asyncio.
+
+    Cada acquire() reserva un token; si el cubo está vacío la reserva deja el
+    saldo en negativo y el llamante espera lo que falte, de modo que las
+    esperas se reparten en orden de llegada sin picos.
+
+    Args:
+        rate: tokens por segundo
+        capacity: ráfaga máxima (por defecto, un segundo de tokens)
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens=1):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def set_rate(self, rate):
+        """Cambia el ritmo conservando el saldo actual"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.rate = float(rate)
+
+    def drain(self, seconds):
+        """Deja el cubo en negativo para que nadie obtenga token en los próximos seconds segundos (p.ej. tras un 429)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def acquire(self, tokens=1):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class KeyedRateLimiter:
+    """Un TokenBucket independiente por clave (p.ej. por host), creado bajo demanda"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, key):
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+            return b
+
+    def acquire(self, key, tokens=1):
+        return self.bucket(key).acquire(tokens)
+
+    async def acquire_async(self, key, tokens=1):
+        return await self.bucket(key).acquire_async(tokens)
@@ -0,0 +1,168 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+# Los resultados serializados mayores que esto se guardan comprimidos con zlib
+COMPRESS_THRESHOLD = 32 * 1024
+
+
+def _encode(data):
+    raw = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    if len(raw) >= COMPRESS_THRESHOLD:
+        return zlib.compress(raw, 6), True
+    return raw, False
+
+
+def _decode(payload, compressed):
+    if compressed:
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+
+class MemoryResultStore:
+    """
+    Almacén en proceso de resultados de escaneo: LRU con presupuesto en bytes y TTL.
+
+    Los resultados se guardan serializados (y comprimidos si son grandes), de modo
+    que el presupuesto refleja la memoria real y get() devuelve siempre una copia.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result_id, data):
+        payload, compressed = _encode(data)
+        with self._lock:
+            self._pop_locked(result_id)
+            self._items[result_id] = (time.time() + self.ttl, payload, compressed)
+            self.bytes += len(payload)
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                self._pop_locked(next(iter(self._items)))
+
+    def get(self, result_id):
+        with self._lock:
+            item = self._items.get(result_id)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                self._pop_locked(result_id)
+                return None
+            self._items.move_to_end(result_id)
+        return _decode(item[1], item[2])
+
+    def delete(self, result_id):
+        with self._lock:
+            self._pop_locked(result_id)
+
+    def _pop_locked(self, result_id):
+        item = self._items.pop(result_id, None)
+        if item is not None:
+            self.bytes -= len(item[1])
+
+    def __contains__(self, result_id):
+        return self.get(result_id) is not None
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._items), "bytes": self.bytes}
+
+
+class SQLiteResultStore:
+    """
+    Almacén de resultados en un fichero SQLite compartible entre varios workers
+    de gunicorn (modo WAL). Mismo contrato que MemoryResultStore.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scan_results (
+                id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                compressed INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scan_results_accessed ON scan_results(accessed);
+        """)
+
+    def put(self, result_id, data):
+        payload, compressed = _encode(data)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scan_results (id, data, compressed, size, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (result_id, payload, int(compressed), len(payload), now + self.ttl, now))
+            self._evict_locked(now)
+
+    def get(self, result_id):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT data, compressed FROM scan_results WHERE id = ? AND expires > ?",
+                                     (result_id, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE scan_results SET accessed = ? WHERE id = ?", (now, result_id))
+        return _decode(row[0], bool(row[1]))
+
+    def delete(self, result_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM scan_results WHERE id = ?", (result_id,))
+
+    def _evict_locked(self, now):
+        self._conn.execute("DELETE FROM scan_results WHERE expires <= ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM scan_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for result_id, size in self._conn.execute("SELECT id, size FROM scan_results ORDER BY accessed ASC"):
+            if total <= self.max_bytes:
+                break
+            victims.append((result_id,))
+            total -= size
+        self._conn.executemany("DELETE FROM scan_results WHERE id = ?", victims)
+
+    def __contains__(self, result_id):
+        return self.get(result_id) is not None
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scan_results").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "bytes": size}
+
+
+def create_result_store(spec=None, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+    """
+    Crea el almacén indicado por spec:
+        "memory"              LRU en proceso (por defecto)
+        "sqlite"              fichero osint_results.sqlite3 en el directorio temporal
+        "sqlite:///ruta.db"   fichero SQLite concreto
+    """
+    spec = spec or "memory"
+    if spec == "memory":
+        return MemoryResultStore(max_bytes=max_bytes, ttl=ttl)
+    if spec == "sqlite":
+        return SQLiteResultStore(os.path.join(tempfile.gettempdir(), "osint_results.sqlite3"), max_bytes, ttl)
+    if spec.startswith("sqlite:///"):
+        return SQLiteResultStore(spec[len("sqlite:///"):], max_bytes, ttl)
+    raise ValueError(f"almacén de resultados desconocido: {spec}")
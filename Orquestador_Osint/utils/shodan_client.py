@@ -0,0 +1,282 @@
+import asyncio
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+
+from utils.helpers import new_session
+from utils.ratelimit import TokenBucket
+
+# SHODAN_API_URL permite apuntar a un servidor de pruebas local
+SHODAN_API_URL = os.environ.get("SHODAN_API_URL", "https://api.shodan.io")
+# La API admite 1 petición por segundo por clave
+SHODAN_RATE = 1.0
+SHODAN_BURST = 1
+SHODAN_TIMEOUT = 10
+# Reintentos ante 429/5xx y errores de red: espera exponencial o la indicada en Retry-After
+MAX_RETRIES = 4
+BACKOFF = 1.0
+BACKOFF_MAX = 30.0
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Respuestas de /shodan/host por IP (solo 200 y 404, que no cambian de un minuto a otro)
+HOST_TTL = 86400
+HOST_CACHE_MAX = 10000
+CACHEABLE_STATUS = (200, 404)
+API_INFO_TTL = 60
+
+
+def normalize_ip(ip):
+    """Forma canónica de la IP (IPv6 comprimida y en minúsculas) o None si no es una IP válida"""
+    try:
+        return str(ipaddress.ip_address(str(ip).strip()))
+    except ValueError:
+        return None
+
+
+class ShodanClient:
+    """
+    Cliente de la API de Shodan para una clave.
+
+    - Token bucket compartido por todas las peticiones de la clave; un 429 vacía
+      el cubo durante el Retry-After para que esperen todos, no solo quien lo recibió,
+      y si el ritmo configurado supera SHODAN_RATE lo reduce a la mitad.
+    - Reintentos con espera exponencial ante 429/5xx y errores de red.
+    - Caché por IP de /shodan/host con TTL, y una sola petición en vuelo por IP:
+      quien pide una IP que ya se está consultando espera ese mismo resultado.
+    - Antes de una búsqueda que gasta créditos comprueba /api-info.
+
+    Los métodos devuelven (status_code, cuerpo): el JSON decodificado si es 200,
+    el texto de la respuesta si no, o (None, mensaje) ante un error de red.
+    """
+
+    def __init__(self, api_key, base_url=SHODAN_API_URL, rate=SHODAN_RATE, burst=SHODAN_BURST,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF, host_ttl=HOST_TTL, host_cache_max=HOST_CACHE_MAX):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.host_ttl = host_ttl
+        self.host_cache_max = host_cache_max
+        self.limiter = TokenBucket(rate, burst)
+        self._session = None
+        self._hosts = OrderedDict()
+        self._inflight = {}
+        self._api_info = None
+        self._slowed_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "cache_hits": 0,
+                       "deduplicated": 0, "query_credits_used": 0}
+
+    # --- Transporte ---------------------------------------------------------
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _send(self, path, params, timeout):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    # Sin reintentos propios de la sesión: los gestiona _retry_delay
+                    self._session = new_session(retries=0, backoff_factor=0)
+        try:
+            r = self._session.get(self.base_url + path, params=params, timeout=timeout)
+            return {"status_code": r.status_code, "text": r.text, "headers": dict(r.headers)}
+        except requests.RequestException as e:
+            return {"error": str(e)}
+
+    def _retry_delay(self, r, attempt):
+        """Segundos a esperar antes de reintentar r, o None si hay que devolverla tal cual"""
+        self._count("requests")
+        status = r.get("status_code")
+        if attempt >= self.max_retries or ("error" not in r and status not in RETRY_STATUS):
+            return None
+        self._count("retries")
+        delay = min(BACKOFF_MAX, self.backoff * 2 ** attempt)
+        if status == 429:
+            self._count("rate_limited")
+            try:
+                delay = min(BACKOFF_MAX, float((r.get("headers") or {}).get("Retry-After", delay)))
+            except ValueError:
+                pass
+            # Si el ritmo configurado supera el que admite la clave se reduce a la mitad
+            # (nunca por debajo del documentado); la espera la hacen todos en el token bucket
+            with self._lock:
+                # Los 429 de peticiones enviadas antes de la última reducción no cuentan otra vez
+                now = time.monotonic()
+                slow_down = now >= self._slowed_until and self.limiter.rate > SHODAN_RATE
+                if slow_down:
+                    self._slowed_until = now + delay
+            if slow_down:
+                self.limiter.set_rate(max(SHODAN_RATE, self.limiter.rate / 2))
+            self.limiter.drain(delay)
+            return 0.0
+        return delay
+
+    @staticmethod
+    def _parse(r):
+        if "error" in r:
+            return None, r["error"]
+        if r["status_code"] == 200:
+            try:
+                return 200, json.loads(r["text"])
+            except ValueError as e:
+                return None, f"Invalid JSON from Shodan: {e}"
+        return r["status_code"], r["text"]
+
+    def _params(self, params):
+        return dict(params or {}, key=self.api_key)
+
+    def get(self, path, params=None, timeout=SHODAN_TIMEOUT):
+        """GET a la API respetando el límite y con reintentos"""
+        params = self._params(params)
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            r = self._send(path, params, timeout)
+            delay = self._retry_delay(r, attempt)
+            if delay is None:
+                return self._parse(r)
+            time.sleep(delay)
+            attempt += 1
+
+    async def get_async(self, path, http, params=None, timeout=SHODAN_TIMEOUT):
+        """Como get sobre el AsyncHttpClient http del motor async"""
+        params = self._params(params)
+        attempt = 0
+        while True:
+            await self.limiter.acquire_async()
+            r = await http.get(self.base_url + path, params=params, timeout=timeout)
+            delay = self._retry_delay(r, attempt)
+            if delay is None:
+                return self._parse(r)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    # --- Hosts --------------------------------------------------------------
+
+    def _claim_host(self, ip):
+        """(resultado en caché, None, None) o (None, future, True si la consulta la hace quien llama)"""
+        with self._lock:
+            entry = self._hosts.get(ip)
+            if entry is not None and entry[0] > time.time():
+                self._hosts.move_to_end(ip)
+                self._stats["cache_hits"] += 1
+                return entry[1], None, None
+            fut = self._inflight.get(ip)
+            if fut is not None:
+                self._stats["deduplicated"] += 1
+                return None, fut, False
+            fut = self._inflight[ip] = Future()
+            return None, fut, True
+
+    def _finish_host(self, ip, fut, result):
+        with self._lock:
+            if result[0] in CACHEABLE_STATUS:
+                self._hosts[ip] = (time.time() + self.host_ttl, result)
+                self._hosts.move_to_end(ip)
+                while len(self._hosts) > self.host_cache_max:
+                    self._hosts.popitem(last=False)
+            self._inflight.pop(ip, None)
+        fut.set_result(result)
+        return result
+
+    def _fail_host(self, ip, fut, exc):
+        with self._lock:
+            self._inflight.pop(ip, None)
+        fut.set_exception(exc)
+
+    def host(self, ip):
+        """(status_code, cuerpo) de /shodan/host/<ip>, desde la caché si está"""
+        cached, fut, leader = self._claim_host(ip)
+        if cached is not None:
+            return cached
+        if not leader:
+            return fut.result()
+        try:
+            return self._finish_host(ip, fut, self.get(f"/shodan/host/{ip}"))
+        except BaseException as e:
+            self._fail_host(ip, fut, e)
+            raise
+
+    async def host_async(self, ip, http):
+        cached, fut, leader = self._claim_host(ip)
+        if cached is not None:
+            return cached
+        if not leader:
+            return await asyncio.wrap_future(fut)
+        try:
+            return self._finish_host(ip, fut, await self.get_async(f"/shodan/host/{ip}", http))
+        except BaseException as e:
+            self._fail_host(ip, fut, e)
+            raise
+
+    # --- Créditos y búsqueda ------------------------------------------------
+
+    def api_info(self, refresh=False):
+        """Plan y créditos restantes (/api-info), refrescados como mucho cada API_INFO_TTL segundos"""
+        with self._lock:
+            cached = self._api_info
+        if cached is not None and not refresh and cached[0] > time.time():
+            return cached[1]
+        status, body = self.get("/api-info")
+        if status != 200:
+            return None
+        with self._lock:
+            self._api_info = (time.time() + API_INFO_TTL, body)
+        return body
+
+    def search(self, query, page=1, timeout=15):
+        """
+        /shodan/host/search. Las búsquedas con filtros (campo:valor) o de la página 2
+        en adelante gastan un crédito de consulta: si no quedan, no se hace la petición.
+        """
+        uses_credit = page > 1 or ":" in query
+        if uses_credit:
+            info = self.api_info()
+            if info is not None and info.get("query_credits", 1) <= 0:
+                return 402, "No Shodan query credits left"
+        status, body = self.get("/shodan/host/search", {"query": query, "page": page}, timeout=timeout)
+        if uses_credit and status == 200:
+            self._count("query_credits_used")
+            with self._lock:
+                if self._api_info is not None and "query_credits" in self._api_info[1]:
+                    self._api_info[1]["query_credits"] -= 1
+        return status, body
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats, cached_hosts=len(self._hosts), inflight=len(self._inflight))
+            if self._api_info is not None:
+                out["query_credits"] = self._api_info[1].get("query_credits")
+        return out
+
+
+_defaults = {"base_url": SHODAN_API_URL, "rate": SHODAN_RATE}
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure_shodan(rate=None, base_url=None):
+    """Cambia el ritmo y/o la URL base de los clientes que se creen a partir de ahora"""
+    with _clients_lock:
+        if rate is not None:
+            _defaults["rate"] = rate
+        if base_url is not None:
+            _defaults["base_url"] = base_url
+        _clients.clear()
+
+
+def get_client(api_key):
+    """ShodanClient compartido por proceso para api_key (límite, caché y créditos comunes)"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = ShodanClient(api_key, base_url=_defaults["base_url"],
+                                                      rate=_defaults["rate"])
+        return client
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import tempfile
+
+UPLOAD_CHUNK = 64 * 1024
+
+
+def save_upload(stream, directory, filename=""):
+    """
+    Copia un fichero subido a directory por trozos calculando su SHA-256 y lo
+    guarda como <sha256><extensión>. Si ya existía (misma imagen subida antes)
+    se descarta la copia nueva.
+
+    Args:
+        stream: objeto con read(n) (p.ej. FileStorage.stream de werkzeug)
+        directory: directorio de subidas
+        filename: nombre original ya saneado, solo para conservar la extensión
+
+    Returns:
+        (sha256 en hex, ruta del fichero, True si el contenido ya estaba guardado)
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        sha = digest.hexdigest()
+        path = os.path.join(directory, sha + os.path.splitext(filename)[1].lower())
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return sha, path, True
+        os.replace(tmp_path, path)
+        return sha, path, False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -2,23 +2,35 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 import tempfile
 import json
 import uuid
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from modules.whois_module import module_whois
 from modules.dns_module import module_dns
-from modules.http_meta_module import module_http_meta
+from modules.http_meta_module import http_meta_stats, module_http_meta
 from modules.username_check_module import module_username_check
 from modules.phone_module import module_phone_lookup
 from modules.exif_module import module_exif
 from modules.shodan_module import module_shodan_host
 
-from utils.helpers import pretty_now
-from utils.pdf_generator import generate_osint_pdf
-from utils.correlator import generate_graphviz_visualization, export_to_maltego, generate_correlation_report
+from utils.helpers import pretty_now, session_stats
+from utils.cache import ResultCache
+from utils.result_store import DEFAULT_MAX_BYTES, DEFAULT_TTL, create_result_store
+from utils.pipeline import DeadlineExecutor, run_with_deadline
+from utils.jobs import JobManager
+from utils.uploads import save_upload
+from utils.pdf_generator import PDF_VERSION, generate_multi_target_pdf, generate_osint_pdf
+from utils.artifacts import ArtifactCache, content_hash
+from utils.geo import GeoIndex, image_points
+from utils.correlator import (GRAPH_VERSION, EntitySetCache, correlate_case, export_to_maltego, generate_correlation_report,
+                              generate_graphviz_visualization)
+from utils.case_graph import case_exists, get_case
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024
@@ -27,128 +39,459 @@ PDF_DIR = os.path.join(tempfile.gettempdir(), "osint_pdfs")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PDF_DIR, exist_ok=True)
 
-results_cache = {}
+# Resultados de escaneo por pdf_id: OSINT_RESULT_STORE=memory | sqlite | sqlite:///ruta.db
+results_cache = create_result_store(
+    os.environ.get("OSINT_RESULT_STORE", "memory"),
+    max_bytes=int(os.environ.get("OSINT_RESULT_STORE_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+    ttl=int(os.environ.get("OSINT_RESULT_TTL", DEFAULT_TTL)))
+# Pool compartido para ejecutar en paralelo los módulos de un mismo escaneo; los módulos que
+# superan SCAN_DEADLINE siguen hasta su propio timeout pero dejan su plaza a los escaneos siguientes
+scan_executor = DeadlineExecutor(max_workers=int(os.environ.get("OSINT_SCAN_WORKERS", 12)))
+# Tiempo máximo (segundos) de un escaneo de dominio; lo que no termine se devuelve como timeout
+SCAN_DEADLINE = float(os.environ.get("OSINT_SCAN_DEADLINE", 30))
+
+# Escaneos asíncronos lanzados con POST /api/jobs
+jobs = JobManager(max_workers=int(os.environ.get("OSINT_JOB_WORKERS", 4)))
+
+# Informes PDF: un trabajo por artefacto que espera al pool de procesos, fuera de los hilos de Flask
+RENDER_WORKERS = int(os.environ.get("OSINT_RENDER_WORKERS", 2))
+render_jobs = JobManager(max_workers=RENDER_WORKERS * 2)
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Entidades extraídas por pdf_id, compartidas por grafo, Maltego e informe de /api/correlate
+entity_sets = EntitySetCache(maxsize=int(os.environ.get("OSINT_ENTITY_CACHE", 64)))
+
+# PDF, grafos y exportaciones generados, por hash del resultado y versión del generador
+artifacts = ArtifactCache(PDF_DIR,
+                          max_bytes=int(os.environ.get("OSINT_ARTIFACT_MB", 512)) * 1024 * 1024,
+                          ttl=int(os.environ.get("OSINT_ARTIFACT_TTL", 7 * 86400)))
+
+# Caché persistente de resultados de módulos (OSINT_CACHE=0 la desactiva)
+module_cache = ResultCache() if os.environ.get("OSINT_CACHE", "1") != "0" else None
+
+def run_module(name, value, fn, *args, options=None, refresh=False, **kwargs):
+    """Ejecuta un módulo pasando por la caché persistente si está activa"""
+    if module_cache is None:
+        return fn(*args, **kwargs)
+    return module_cache.call(name, value, fn, *args, options=options, refresh=refresh, **kwargs)
+
+def _named_exif(item, upload):
+    # El fichero se guarda por hash; en el resultado se muestra el nombre con el que se subió
+    item = dict(item, file=upload["path"], name=upload["name"], sha256=upload["sha256"])
+    if item.get("metadata"):
+        metadata = item["metadata"]
+        item["metadata"] = dict(metadata, file_info=dict(metadata["file_info"], filename=upload["name"]))
+    return item
+
+def scan_images(uploads, refresh=False, on_file=None):
+    """
+    module_exif con caché por contenido: una imagen ya analizada (mismo SHA-256)
+    se resuelve con una consulta a la caché sin volver a leer el fichero.
+    """
+    out = {"module": "exif_metadata", "inputs": [u["path"] for u in uploads], "ts": pretty_now(),
+           "results": [None] * len(uploads)}
+    missing = {}
+    for i, upload in enumerate(uploads):
+        cached = None if module_cache is None or refresh else module_cache.get("exif", upload["sha256"])
+        if cached is None:
+            missing.setdefault(upload["path"], []).append(i)
+            continue
+        out["results"][i] = _named_exif(cached, upload)
+        if on_file:
+            on_file(out["results"][i])
+
+    def analyzed(item):
+        # Misma forma que al leerlo de la caché (y serializable con jsonify: sin IFDRational)
+        item = json.loads(json.dumps(item, default=str))
+        indexes = missing[item["file"]]
+        if module_cache is not None:
+            module_cache.set("exif", uploads[indexes[0]]["sha256"], item)
+        for i in indexes:
+            out["results"][i] = _named_exif(item, uploads[i])
+            if on_file:
+                on_file(out["results"][i])
+
+    if missing:
+        module_exif(list(missing), on_result=analyzed)
+    return out
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
-@app.route("/api/scan", methods=["POST"])
-def api_scan():
+def _scan_request():
+    """
+    Lee los parámetros del escaneo (JSON o formulario) y guarda las imágenes subidas.
+
+    Returns:
+        (spec, None) si la petición es válida o (None, respuesta de error)
+    """
     if request.is_json:
         ty = request.json.get("type")
         value = request.json.get("value")
         numverify_key = request.json.get("numverify_key")
         shodan_key = request.json.get("shodan_key")
+        refresh = bool(request.json.get("refresh"))
+        case_id = request.json.get("case")
     else:
         ty = request.form.get("type")
         value = request.form.get("value")
         numverify_key = request.form.get("numverify_key")
         shodan_key = request.form.get("shodan_key")
+        refresh = request.form.get("refresh") in ("1", "true", "on")
+        case_id = request.form.get("case")
+
+    spec = {"type": ty, "value": value, "numverify_key": numverify_key,
+            "shodan_key": shodan_key, "refresh": refresh, "case": case_id or None}
+
+    if ty == "images":
+        files = request.files.getlist("files")
+        if not files or len(files) == 0:
+            return None, (jsonify({"error":"no files uploaded"}), 400)
+        saved = []
+        for f in files:
+            if f.filename == '':
+                continue
+            filename = secure_filename(f.filename)
+            # Se guarda por contenido: subidas repetidas comparten fichero y no se pisan nombres iguales
+            sha, path, _ = save_upload(f.stream, UPLOAD_DIR, filename)
+            saved.append({"name": filename, "sha256": sha, "path": path})
+        if not saved:
+            return None, (jsonify({"error":"no valid files uploaded"}), 400)
+        spec["uploads"] = saved
+        spec["paths"] = [u["path"] for u in saved]
+    elif ty not in ("domain", "username", "phone", "ip") or not value:
+        return None, (jsonify({"error": f"invalid type '{ty}' or missing value"}), 400)
+    return spec, None
+
+def execute_scan(spec, on_result=None, on_file=None):
+    """
+    Ejecuta el escaneo descrito por spec y lo guarda en results_cache.
 
+    Args:
+        spec: dict devuelto por _scan_request
+        on_result: callable(result) opcional, llamado según termina cada módulo
+        on_file: callable(resultado) opcional, llamado según termina cada imagen en escaneos EXIF
+    """
+    ty, value, refresh = spec["type"], spec["value"], spec["refresh"]
     result = {"target": {}, "results": [], "started": pretty_now()}
 
-    try:
-        if ty == "domain" and value:
-            result["target"]["domain"] = value
-            result["results"].append(module_whois(value))
-            result["results"].append(module_dns(value))
-            result["results"].append(module_http_meta(value))
-        elif ty == "username" and value:
-            result["target"]["username"] = value
-            result["results"].append(module_username_check(value))
-        elif ty == "phone" and value:
-            result["target"]["phone"] = value
-            result["results"].append(module_phone_lookup(value, api_key=numverify_key))
-        elif ty == "ip" and value:
-            result["target"]["ip"] = value
-            result["results"].append(module_shodan_host(value, api_key=shodan_key))
-        elif ty == "images":
-            files = request.files.getlist("files")
-            if not files or len(files) == 0:
-                return jsonify({"error":"no files uploaded"}), 400
-            saved = []
-            for f in files:
-                if f.filename == '':
-                    continue
-                filename = secure_filename(f.filename)
-                path = os.path.join(UPLOAD_DIR, filename)
-                f.save(path)
-                saved.append(path)
-            if not saved:
-                return jsonify({"error":"no valid files uploaded"}), 400
-            result["target"]["images"] = saved
-            result["results"].append(module_exif(saved))
-        else:
-            return jsonify({"error": f"invalid type '{ty}' or missing value"}), 400
+    def add(module_result):
+        result["results"].append(module_result)
+        if on_result:
+            on_result(module_result)
 
-    except Exception as e:
-        import traceback
-        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+    if ty == "domain":
+        result["target"]["domain"] = value
+        calls = [
+            ("whois", value, run_module, ("whois", value, module_whois, value), {"options": {"summary": False}, "refresh": refresh}),
+            ("dns", value, run_module, ("dns", value, module_dns, value), {"refresh": refresh}),
+            ("http_meta", value, run_module, ("http_meta", value, module_http_meta, value), {"refresh": refresh}),
+        ]
+        results, timings = run_with_deadline(scan_executor, calls, SCAN_DEADLINE, on_result=on_result)
+        result["results"].extend(results)
+        result["timings"] = timings
+        result["partial"] = any(t["status"] == "timeout" for t in timings.values())
+    elif ty == "username":
+        result["target"]["username"] = value
+        add(run_module("username_check", value, module_username_check, value,
+                       options={"compact": False, "sites_file": None}, refresh=refresh))
+    elif ty == "phone":
+        result["target"]["phone"] = value
+        add(run_module("phone_lookup", value, module_phone_lookup, value,
+                       api_key=spec["numverify_key"], refresh=refresh))
+    elif ty == "ip":
+        result["target"]["ip"] = value
+        add(run_module("shodan_host", value, module_shodan_host, value,
+                       api_key=spec["shodan_key"], refresh=refresh))
+    elif ty == "images":
+        result["target"]["images"] = spec["paths"]
+        add(scan_images(spec["uploads"], refresh, on_file))
 
     result["finished"] = pretty_now()
     
     result_id = str(uuid.uuid4())
-    results_cache[result_id] = result
     result["pdf_id"] = result_id
-    
+    result["content_hash"] = content_hash(result)
+    results_cache.put(result_id, result)
+    if spec.get("case"):
+        # Se incorpora al grafo del caso una sola vez, al terminar el escaneo
+        get_case(spec["case"]).add_result(result_id, result)
+    return result
+
+@app.route("/api/scan", methods=["POST"])
+def api_scan():
+    spec, error = _scan_request()
+    if error:
+        return error
+
+    try:
+        result = execute_scan(spec)
+    except Exception as e:
+        import traceback
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
     return jsonify(result)
 
+def _scan_job(job, spec):
+    result = execute_scan(spec, on_result=lambda r: job.emit("module", r),
+                          on_file=lambda r: job.emit("file", r))
+    return {"pdf_id": result["pdf_id"], "partial": result.get("partial", False)}
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    """Lanza un escaneo en segundo plano y devuelve su id al instante"""
+    spec, error = _scan_request()
+    if error:
+        return error
+    job = jobs.submit("scan", _scan_job, spec)
+    return jsonify({"job_id": job.id, "status": job.status,
+                    "poll": f"/api/jobs/{job.id}", "events": f"/api/jobs/{job.id}/events"}), 202
+
+def _get_job(job_id):
+    return jobs.get(job_id) or render_jobs.get(job_id)
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Estado del trabajo y eventos con seq > ?after=N"""
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job.to_dict(after=request.args.get("after", 0, type=int)))
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent events: un evento 'module' por resultado ('file' por imagen) y 'done'/'error' al terminar"""
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    after = request.headers.get("Last-Event-ID", request.args.get("after", 0), type=int)
+
+    def stream():
+        seq = after
+        while True:
+            events, finished = job.wait_events(seq, timeout=15)
+            for ev in events:
+                seq = ev["seq"]
+                yield f"id: {seq}\nevent: {ev['event']}\ndata: {json.dumps(ev['data'], default=str)}\n\n"
+            if finished and seq >= len(job.events):
+                final = job.to_dict(after=seq)
+                yield f"event: {job.status}\ndata: {json.dumps({'result': final['result'], 'error': final['error']})}\n\n"
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/download_report", methods=["GET"])
+def download_report():
+    """PDF consolidado de varios escaneos (?ids=a,b,c): índice y una sección por objetivo"""
+    ids = [i for i in request.args.get("ids", "").split(",") if i]
+    if not ids:
+        return jsonify({"error": "ids are required"}), 400
+    results = []
+    for result_id in ids:
+        data = _load_result(result_id)
+        if data is None:
+            return jsonify({"error": f"Result not found: {result_id}"}), 404
+        results.append(data)
+    key = content_hash([data["content_hash"] for data in results])
+    return _serve_pdf("report", key, generate_multi_target_pdf, results, f"osint_report_{len(ids)}_targets.pdf")
+
+def _get_render_pool():
+    """Pool de procesos para generar PDF (OSINT_RENDER_WORKERS procesos)"""
+    global _render_pool
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS)
+    return _render_pool
+
+def _render_job(job, kind, key, render, data, download):
+    def build(directory):
+        global _render_pool
+        pdf_path = os.path.join(directory, "report.pdf")
+        pool = _get_render_pool()
+        try:
+            pool.submit(render, data, pdf_path).result()
+        except BrokenProcessPool:
+            # Un proceso murió (p.ej. sin memoria): el siguiente trabajo usará un pool nuevo
+            with _render_pool_lock:
+                if _render_pool is pool:
+                    _render_pool = None
+            raise
+        return {"file": pdf_path}
+    
+    _, etag, _ = artifacts.get_or_create(kind, key, PDF_VERSION, build)
+    return {"etag": etag, "download": download}
+
+def _serve_pdf(kind, key, render, data, download_name):
+    """
+    Sirve el PDF desde la caché de artefactos. Si aún no existe, encarga render(data, ruta)
+    al pool de procesos y responde 202 con la URL del trabajo; las peticiones del mismo
+    PDF mientras se genera reciben el mismo trabajo.
+    """
+    found = artifacts.lookup(kind, key, PDF_VERSION)
+    if found:
+        return send_file(found[0]["file"], as_attachment=True, download_name=download_name,
+                         etag=found[1], conditional=True, max_age=0)
+    
+    download = request.full_path.rstrip("?")
+    job = render_jobs.submit_once(f"{kind}:{key}", "pdf", _render_job, kind, key, render, data, download)
+    poll = f"/api/jobs/{job.id}"
+    return (jsonify({"job_id": job.id, "status": job.status, "poll": poll, "download": download}), 202,
+            {"Location": poll, "Retry-After": "1"})
+
+def _load_result(result_id):
+    """Resultado guardado con su content_hash (los anteriores a este campo lo calculan al vuelo)"""
+    data = results_cache.get(result_id)
+    if data is not None and not data.get("content_hash"):
+        data["content_hash"] = content_hash(data)
+    return data
+
+def _artifact_response(payload, etag):
+    # JSON con ETag: un If-None-Match que coincide devuelve 304 sin cuerpo
+    resp = jsonify(payload)
+    resp.set_etag(etag)
+    return resp.make_conditional(request)
+
 @app.route("/api/download_pdf/<result_id>", methods=["GET"])
 def download_pdf(result_id):
-    if result_id not in results_cache:
+    data = _load_result(result_id)
+    if data is None:
         return jsonify({"error": "Result not found or expired"}), 404
     
-    data = results_cache[result_id]
-    pdf_filename = f"osint_report_{result_id[:8]}.pdf"
-    pdf_path = os.path.join(PDF_DIR, pdf_filename)
-    
-    try:
-        generate_osint_pdf(data, pdf_path)
-        return send_file(pdf_path, as_attachment=True, download_name=pdf_filename)
-    except Exception as e:
-        return jsonify({"error": f"PDF generation failed: {str(e)}"}), 500
+    # Mismo contenido y versión del generador -> mismo PDF, servido desde disco
+    return _serve_pdf("pdf", data["content_hash"], generate_osint_pdf, data, f"osint_report_{result_id[:8]}.pdf")
 
 @app.route("/api/correlate/<result_id>", methods=["GET"])
 def correlate_data(result_id):
     """Genera correlación y visualización de datos"""
-    if result_id not in results_cache:
+    # Las entidades se extraen una vez por resultado y las comparten los tres consumidores
+    data = entity_sets.get(result_id, lambda: _load_result(result_id))
+    if data is None:
         return jsonify({"error": "Result not found"}), 404
     
-    data = results_cache[result_id]
+    # ?render=0: solo el JSON (nodos, aristas, posiciones) para dibujarlo en el navegador
+    render = request.args.get("render", "1") != "0"
+    
+    def build(directory):
+        return {
+            # Generar grafo visual
+            "graph": generate_graphviz_visualization(data, os.path.join(directory, "graph"), render=render),
+            # Exportar a Maltego
+            "maltego": export_to_maltego(data, os.path.join(directory, "maltego")),
+            # Generar reporte de correlación
+            "correlation_report": generate_correlation_report(data)
+        }
     
     try:
-        # Generar grafo visual
-        graph_path = os.path.join(PDF_DIR, f"graph_{result_id[:8]}")
-        graph_result = generate_graphviz_visualization(data, graph_path)
-        
-        # Exportar a Maltego
-        maltego_path = os.path.join(PDF_DIR, f"maltego_{result_id[:8]}")
-        maltego_result = export_to_maltego(data, maltego_path)
-        
-        # Generar reporte de correlación
-        correlation_report = generate_correlation_report(data)
-        
-        return jsonify({
-            "graph": graph_result,
-            "maltego": maltego_result,
-            "correlation_report": correlation_report
-        })
+        meta, etag, _ = artifacts.get_or_create(_graph_kind(render), data.content_hash, GRAPH_VERSION, build)
+        return _artifact_response(meta, etag)
     
     except Exception as e:
         import traceback
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
 
+@app.route("/api/geo/within", methods=["GET"])
+def geo_within():
+    """Imágenes de uno o varios escaneos (?ids=a,b) a r_km o menos de lat/lon"""
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    r_km = request.args.get("r_km", 1.0, type=float)
+    ids = [i for i in request.args.get("ids", "").split(",") if i]
+    if lat is None or lon is None or not ids:
+        return jsonify({"error": "lat, lon and ids are required"}), 400
+    results = []
+    for result_id in ids:
+        data = results_cache.get(result_id)
+        if data is None:
+            return jsonify({"error": f"Result not found: {result_id}"}), 404
+        results.extend(data.get("results", []))
+    index = GeoIndex(image_points(results))
+    hits = index.within(lat, lon, r_km)
+    return jsonify({"indexed": len(index), "matches": [{"file": f, "distance_km": d} for f, d in hits]})
+
+@app.route("/api/cases/<case_id>", methods=["GET"])
+def case_stats(case_id):
+    """Escaneos, entidades y relaciones acumulados en un caso"""
+    if not case_exists(case_id):
+        return jsonify({"error": f"Case not found: {case_id}"}), 404
+    case = get_case(case_id)
+    return jsonify(dict(case.stats(), result_ids=case.result_ids()))
+
+@app.route("/api/cases/<case_id>/results", methods=["POST"])
+def case_add_result(case_id):
+    """Incorpora al caso un resultado ya guardado: {"result_id": ...}"""
+    result_id = (request.get_json(silent=True) or {}).get("result_id")
+    data = results_cache.get(result_id) if result_id else None
+    if data is None:
+        return jsonify({"error": "Result not found"}), 404
+    case = get_case(case_id)
+    added = case.add_result(result_id, data)
+    return jsonify({"added": added, "case": case.stats()})
+
+@app.route("/api/cases/<case_id>/correlate", methods=["GET"])
+def case_correlate(case_id):
+    """Grafo, Maltego e informe de todos los escaneos del caso"""
+    if not case_exists(case_id):
+        return jsonify({"error": f"Case not found: {case_id}"}), 404
+    case = get_case(case_id)
+    try:
+        # Un caso cambia al añadirle escaneos: la clave es el caso más sus result_ids
+        key = content_hash({"case": case_id, "results": case.result_ids()})
+        meta, etag, _ = artifacts.get_or_create(
+            "case", key, GRAPH_VERSION,
+            lambda directory: correlate_case(case, os.path.join(directory, f"case_{secure_filename(case_id)}")))
+        return _artifact_response(meta, etag)
+    except Exception as e:
+        import traceback
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
+@app.route("/api/cases/<case_id>/within", methods=["GET"])
+def case_within(case_id):
+    """Fotos del caso a r_km o menos de lat/lon"""
+    lat = request.args.get("lat", type=float)
+    lon = request.args.get("lon", type=float)
+    if lat is None or lon is None:
+        return jsonify({"error": "lat and lon are required"}), 400
+    if not case_exists(case_id):
+        return jsonify({"error": f"Case not found: {case_id}"}), 404
+    hits = get_case(case_id).geo_index.within(lat, lon, request.args.get("r_km", 1.0, type=float))
+    return jsonify({"matches": [{"file": f, "distance_km": d} for f, d in hits]})
+
+@app.route("/api/stats", methods=["GET"])
+def api_stats():
+    """Contadores de la sesión HTTP compartida (reutilización de conexiones)"""
+    return jsonify({"http": session_stats(), "http_meta": http_meta_stats(), "cache": module_cache.stats() if module_cache else None,
+                    "results": results_cache.stats(), "artifacts": artifacts.stats()})
+
+
 @app.route("/api/download_graph/<result_id>", methods=["GET"])
 def download_graph(result_id):
-    """Descarga el grafo generado"""
-    graph_file = os.path.join(PDF_DIR, f"graph_{result_id[:8]}.png")
+    """Descarga el grafo generado (?format=json para nodos, aristas y posiciones)"""
+    ext = "json" if request.args.get("format") == "json" else "png"
+    data = entity_sets.get(result_id, lambda: _load_result(result_id))
+    found = None
+    if data is not None:
+        # El PNG solo existe si se correló con render; el JSON en ambos casos
+        for render in ((True, False) if ext == "json" else (True,)):
+            found = artifacts.lookup(_graph_kind(render), data.content_hash, GRAPH_VERSION)
+            if found:
+                break
+    graph_file = found[0]["graph"].get("json_file" if ext == "json" else "graph_file") if found else None
     
-    if not os.path.exists(graph_file):
+    if not graph_file or not os.path.exists(graph_file):
         return jsonify({"error": "Graph not found"}), 404
     
-    return send_file(graph_file, as_attachment=True, download_name=f"osint_graph_{result_id[:8]}.png")
+    return send_file(graph_file, as_attachment=True, download_name=f"osint_graph_{result_id[:8]}.{ext}",
+                     etag=f"{found[1]}-{ext}", conditional=True, max_age=0)
+
+def _graph_kind(render):
+    return "correlate" if render else "correlate-json"
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file